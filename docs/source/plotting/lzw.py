@@ -1,10 +1,27 @@
 import pickle
+import string
+from random import choices
+from timeit import timeit
 
 import numpy as np
 from matplotlib import pyplot as plt
+from more_itertools import collapse, consume, stagger
 from tqdm.auto import tqdm
 
-from scicomp.exam.kk import lzw_encode
+from scicomp.exam.kk import lzw_decode, lzw_encode
+
+
+def lzw_decode_tuples(idx, alphabet):
+    """The original decoder, which keeps a bag of tuples."""
+    bag = [(a,) for a in alphabet]
+    return collapse((
+        bag[i]
+        for i, nexti in stagger(idx, offsets=(0, 1), longest=True)
+        for _ in [
+            bag.append((
+                *bag[i], next(iter(bag[nexti] if len(bag) > nexti else bag[i]))
+            )) if nexti is not None else None]
+    ), levels=1)
 
 
 digitss = pickle.load(open('pi/pi-bases.pickle', 'rb'))
@@ -23,3 +40,47 @@ plt.title(r'LZW encoding $\pi$')
 plt.xlabel('base')
 plt.ylabel('implicit information, nats')
 plt.savefig('../_static/lzw-pi-bases.svg')
+
+
+lengths = np.logspace(2, 7, 11, dtype=int).tolist()
+times = np.array([[
+    timeit(lambda: consume(lzw_encode(s, string.ascii_lowercase)), number=1)
+    for i in range(3)
+    for s in [''.join(choices(string.ascii_lowercase, k=length))]
+] for length in tqdm(lengths)])
+
+plt.figure(figsize=(3.5, 2.6))
+plt.title('LZW encoding runtime')
+y = times.mean(-1)
+plt.loglog(lengths, y[-1] * (np.array(lengths) / lengths[-1]), '--',
+           c=plt.loglog(lengths, y, label='$O(n)$')[0].get_color())
+plt.legend()
+plt.xlabel('n')
+plt.ylabel('runtime, s')
+plt.savefig('../_static/lzw-runtime.svg')
+
+
+lengths = np.logspace(2, 6, 9, dtype=int).tolist()
+inputs = {
+    'random': lambda length: ''.join(choices(string.ascii_lowercase, k=length)),
+    'periodic': lambda length: (length // 26 + 1) * string.ascii_lowercase
+}
+funcs = {
+    'triples': lambda c: consume(lzw_decode(c, string.ascii_lowercase)),
+    'tuples': lambda c: consume(lzw_decode_tuples(c, string.ascii_lowercase))
+}
+throughputs = {(iname, fname): [
+    length / min(timeit(lambda: f(c), number=1) for i in range(3))
+    for length in tqdm(lengths)
+    for c in [list(lzw_encode(inp(length), string.ascii_lowercase))]
+] for iname, inp in inputs.items() for fname, f in funcs.items()}
+
+plt.figure(figsize=(3.5, 2.6))
+plt.title('LZW decoding throughput')
+for (iname, fname), t in throughputs.items():
+    plt.loglog(lengths, t, '-' if iname == 'random' else '--',
+               c='C0' if fname == 'triples' else 'C1', label=f'{fname}, {iname}')
+plt.legend(fontsize='small')
+plt.xlabel('n')
+plt.ylabel('symbols / s')
+plt.savefig('../_static/lzw-decode.svg')
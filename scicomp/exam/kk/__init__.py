@@ -1,5 +1,8 @@
 __version__ = 42
 
 from .kmp import *
+from .aho_corasick import *
 from .bwt import *
 from .lzw import *
+from .stages import *
+from .profiling import *
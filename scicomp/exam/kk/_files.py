@@ -0,0 +1,18 @@
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Union
+
+
+_PathLike = Union[str, os.PathLike]
+
+
+@contextmanager
+def _mapped(path: _PathLike):
+    """Memory-map `path` read-only (or give an empty buffer)."""
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
@@ -0,0 +1,190 @@
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice, starmap
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Iterable, Iterator, Literal, NamedTuple, Optional, TypeVar
+
+import numpy as np
+
+
+_R = TypeVar('_R')
+_Pool = Literal['process', 'thread']
+
+_TASK_INPUTS = 64  # inputs per task, at most...
+_TASK_SIZE = 2**20  # ...and in total (roughly) this many elements
+_SHARED_SIZE = 2**20  # bytes: inputs at least this big go through shared memory
+
+
+def _starmap(func: Callable[..., _R], args: Iterable[tuple], workers: Optional[int] = None) -> Iterator[_R]:
+    """Like `itertools.starmap`, but in a process pool, with at most two tasks
+    per worker in flight, so that memory use stays bounded for long inputs."""
+    if workers == 1:
+        yield from starmap(func, args)
+        return
+
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers)
+    try:
+        args = iter(args)
+        pending = deque(executor.submit(func, *a) for a in islice(args, 2 * workers))
+        while pending:
+            ret = pending.popleft().result()
+            pending.extend(executor.submit(func, *a) for a in islice(args, 1))
+            yield ret
+    finally:
+        # if closed early (e.g. after a first match), wait for the running
+        # tasks only, not for the queued ones as well
+        executor.shutdown(cancel_futures=True)
+
+
+class _Shared(NamedTuple):
+    """A `bytes`-like object or NumPy array left in shared memory for a worker
+    process, instead of being pickled."""
+    name: str
+    kind: type
+    dtype: str
+    shape: tuple[int, ...]
+
+
+def _picklable(x: Any) -> Any:
+    """`x`, but a `memoryview` (which cannot be pickled) as the same sequence:
+    `bytes` if it is one of (unsigned) bytes, and otherwise an array of its
+    format and shape."""
+    if isinstance(x, memoryview):
+        return x.tobytes() if x.format == 'B' and x.ndim == 1 else np.asarray(x)
+    return x
+
+
+def _share(x: Any) -> Optional[tuple[_Shared, SharedMemory]]:
+    """Copy `x` into a new block of shared memory, if it is big enough to be
+    worth it and can be."""
+    if isinstance(x, (bytes, bytearray)):
+        arr, kind = np.frombuffer(x, dtype=np.uint8), type(x)
+    elif isinstance(x, np.ndarray) and not x.dtype.hasobject:
+        arr, kind = x, np.ndarray
+    else:
+        return None
+    if arr.nbytes < _SHARED_SIZE:
+        return None
+    shm = SharedMemory(create=True, size=arr.nbytes)
+    np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+    return _Shared(shm.name, kind, arr.dtype.str, arr.shape), shm
+
+
+def _apply(func: Callable[[Any], _R], x: Any) -> _R:
+    """``func(x)``, attaching `x` first if it is `_Shared`."""
+    if not isinstance(x, _Shared):
+        return func(x)
+    shm = SharedMemory(x.name)
+    arr = np.ndarray(x.shape, x.dtype, buffer=shm.buf)
+    try:
+        if x.kind is np.ndarray:
+            arr.flags.writeable = False
+            return func(arr)
+        return func(x.kind(arr))
+    finally:
+        del arr
+        try:
+            shm.close()
+        except BufferError:  # the result is a view, so leave it mapped
+            pass
+
+
+def _run(func: Callable[[Any], _R], inputs: list) -> list[_R]:
+    """The task of a worker: `func` applied to a chunk of `inputs`."""
+    return [_apply(func, x) for x in inputs]
+
+
+def _release(shared: Iterable[SharedMemory]):
+    """Free the shared memory of the inputs of a finished task."""
+    for shm in shared:
+        shm.close()
+        shm.unlink()
+
+
+def _size(x: Any) -> int:
+    """The number of elements of `x` (or 1 if it does not say)."""
+    try:
+        return len(x)
+    except TypeError:
+        return 1
+
+
+def _chunks(inputs: Iterable, chunksize: int) -> Iterator[tuple[list[int], list]]:
+    """Group `inputs` into tasks (of their indices and themselves) of at most
+    `chunksize` inputs and, unless that would leave one alone, not (much)
+    more than `_TASK_SIZE` elements."""
+    indices, chunk, size = [], [], 0
+    for i, x in enumerate(inputs):
+        indices.append(i)
+        chunk.append(x)
+        size += _size(x)
+        if len(chunk) == chunksize or size >= _TASK_SIZE:
+            yield indices, chunk
+            indices, chunk, size = [], [], 0
+    if chunk:
+        yield indices, chunk
+
+
+def _imap(func: Callable[[Any], _R], inputs: Iterable, workers: Optional[int] = None,
+          pool: _Pool = 'process', chunksize: int = _TASK_INPUTS, ordered=True) -> Iterator:
+    """Like `map`, but in a process or thread pool, a chunk of `inputs` per
+    task, with at most two tasks per worker in flight. In order, no more
+    tasks are submitted while about as many results as that are held back
+    waiting for an earlier (slow) one.
+
+    In a process pool, `bytes`-like and NumPy array inputs of at least
+    `_SHARED_SIZE` bytes are passed through shared memory, and the rest are
+    pickled.
+
+    Returns:
+        The results, in order, or with ``ordered=False``, as they finish,
+        each in a tuple with the index of its input.
+    """
+    if pool not in ('process', 'thread'):
+        raise ValueError(f"pool should be 'process' or 'thread', not {pool!r}.")
+    if workers == 1:
+        results = map(func, inputs)
+        yield from results if ordered else enumerate(results)
+        return
+
+    workers = workers or os.cpu_count()
+    executor = (ProcessPoolExecutor if pool == 'process' else ThreadPoolExecutor)(workers)
+    tasks = _chunks(inputs, chunksize)
+    pending = {}  # future: (indices, shared memory)
+    done, first = {}, 0  # finished results waiting for the ones before them
+    backlog = 2 * workers * chunksize
+
+    def submit(n: int):
+        for indices, chunk in islice(tasks, n):
+            shared = []
+            if pool == 'process':
+                for j, x in enumerate(chunk):
+                    chunk[j] = _picklable(x)
+                    if s := _share(chunk[j]):
+                        chunk[j] = s[0]
+                        shared.append(s[1])
+            pending[executor.submit(_run, func, chunk)] = indices, shared
+
+    try:
+        submit(2 * workers)
+        while pending:
+            for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                indices, shared = pending.pop(future)
+                _release(shared)
+                results = future.result()
+                if not ordered:
+                    submit(1)
+                    yield from zip(indices, results)
+                    continue
+                done.update(zip(indices, results))
+                while first in done:
+                    yield done.pop(first)
+                    first += 1
+                if len(done) < backlog:
+                    submit(2 * workers - len(pending))
+    finally:
+        executor.shutdown(cancel_futures=True)
+        for _, shared in pending.values():
+            _release(shared)
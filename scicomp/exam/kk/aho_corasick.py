@@ -0,0 +1,104 @@
+from collections import deque
+from typing import Generic, Hashable, Iterable, Iterator, Sequence, TypeVar
+
+
+__all__ = 'AhoCorasick', 'multi_search'
+
+
+_T = TypeVar('_T', bound=Hashable)
+
+
+class AhoCorasick(Generic[_T]):
+    """The `Aho–Corasick automaton
+    <https://en.wikipedia.org/wiki/Aho%E2%80%93Corasick_algorithm>`_ [AC75]_
+    for finding many needles at once.
+
+    It is the KMP idea (see `kmp_search`) applied to a trie of the needles:
+    each node has a failure link to the node of its longest proper suffix
+    that is also in the trie, so that on a mismatch the search continues from
+    there instead of starting over. Output links then skip to the nearest
+    such suffix that is a whole needle, so that every match costs
+    :math:`O(1)` to report.
+
+    Args:
+        needles: the subsequences to search for. Their elements need to be
+            hashable.
+
+    Notes:
+        Building the automaton takes time proportional to the total length of
+        the `needles`, and a search through a haystack of length :math:`n`
+        takes :math:`O(n + \\mathrm{matches})`.
+    """
+
+    def __init__(self, needles: Iterable[Sequence[_T]]):
+        self.needles = list(needles)
+
+        # the trie: goto[node][element] -> node, with needles ending at a node
+        self.goto: list[dict[_T, int]] = [{}]
+        self.ends: list[list[int]] = [[]]
+        for k, needle in enumerate(self.needles):
+            node = 0
+            for el in needle:
+                if (nxt := self.goto[node].get(el)) is None:
+                    nxt = self.goto[node][el] = len(self.goto)
+                    self.goto.append({})
+                    self.ends.append([])
+                node = nxt
+            self.ends[node].append(k)
+
+        # failure and output links, breadth-first, so shorter suffixes are done
+        self.fail = [0] * len(self.goto)
+        self.out = [-1] * len(self.goto)
+        queue = deque([0])
+        while queue:
+            node = queue.popleft()
+            if node:
+                f = self.fail[node]
+                self.out[node] = f if self.ends[f] else self.out[f]
+            for el, child in self.goto[node].items():
+                queue.append(child)
+                if node:  # (children of the root fail to the root)
+                    f = self.fail[node]
+                    while f and el not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[child] = self.goto[f].get(el, 0)
+
+    def _matches(self, node: int, end: int) -> Iterator[tuple[Sequence[_T], int]]:
+        if not self.ends[node]:
+            node = self.out[node]
+        while node >= 0:
+            for k in self.ends[node]:
+                yield self.needles[k], end - len(self.needles[k])
+            node = self.out[node]
+
+    def finditer(self, haystack: Iterable[_T]) -> Iterator[tuple[Sequence[_T], int]]:
+        """Find all occurrences of all needles in `haystack`, in one pass.
+
+        Args:
+            haystack: sequence to search in. Any iterable will do, since it is
+                consumed strictly left to right, and the matches are reported
+                as soon as they are seen.
+
+        Returns:
+            An iterator over ``(needle, position)`` for each occurrence (even
+            overlapping ones), ordered by where they end, and longer needles
+            first. As with `kmp_search`, empty needles match at every
+            position, including ``len(haystack)``.
+        """
+        goto, fail = self.goto, self.fail
+        node = 0
+        yield from self._matches(node, 0)
+        for i, el in enumerate(haystack, 1):
+            while node and el not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(el, 0)
+            yield from self._matches(node, i)
+
+
+def multi_search(needles: Iterable[Sequence[_T]], haystack: Iterable[_T]) -> Iterator[tuple[Sequence[_T], int]]:
+    """Find all occurrences of all `needles` in `haystack` with `AhoCorasick`.
+
+    Returns:
+        An iterator over ``(needle, position)``. See `AhoCorasick.finditer`.
+    """
+    return AhoCorasick(needles).finditer(haystack)
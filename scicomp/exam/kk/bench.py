@@ -0,0 +1,229 @@
+"""Benchmarks of the string algorithms, with scaling regression checks.
+
+Run as ``python -m scicomp.exam.kk.bench``. Every benchmark is timed on
+every corpus at a range of sizes, and a scaling exponent :math:`b` is fitted
+to the runtimes as :math:`t \\propto n^b`. The results are printed (or saved)
+as JSON, and can be compared against those of a previous run (the baseline)
+to flag regressions::
+
+    python -m scicomp.exam.kk.bench -o baseline.json
+    # ... change something ...
+    python -m scicomp.exam.kk.bench --baseline baseline.json
+
+which exits with status 1 if any benchmark got slower (at the largest size)
+by more than a factor of ``--tolerance`` or started to scale worse.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+from functools import lru_cache
+from math import isqrt
+from time import perf_counter
+from typing import Callable, Iterable, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from . import __version__
+from .bwt import bwt_decode, bwt_encode
+from .bwt.suffix_array import suffix_array
+from .kmp import kmp_search
+from .lzw import lzw_decode, lzw_encode
+
+
+__all__ = 'Benchmark', 'BENCHMARKS', 'CORPORA', 'exponent', 'run', 'compare', 'main'
+
+
+_SIZES = (1_000, 3_000, 10_000, 30_000, 100_000)
+_ALPHABET = bytes(range(256))
+
+_TOLERANCE = 1.5  # allowed slowdown at the largest size
+_EXPONENT_TOLERANCE = 0.15  # allowed increase of the scaling exponent
+
+
+def _chudnovsky(a: int, b: int) -> tuple[int, int, int]:
+    """Binary splitting of the terms ``a:b`` of the Chudnovsky series."""
+    if b - a == 1:
+        p = q = 1
+        if a:
+            p, q = (6*a - 5) * (2*a - 1) * (6*a - 1), a**3 * 10939058860032000
+        return p, q, (-1)**a * p * (13591409 + 545140134*a)
+    m = (a + b) // 2
+    (p1, q1, t1), (p2, q2, t2) = _chudnovsky(a, m), _chudnovsky(m, b)
+    return p1 * p2, q1 * q2, q2 * t1 + p1 * t2
+
+
+@lru_cache(maxsize=None)
+def _pi(n: int) -> bytes:
+    """The first `n` decimal digits of :math:`\\pi`, by the Chudnovsky series
+    (each term of which adds about 14 digits)."""
+    _, q, t = _chudnovsky(0, n // 14 + 2)
+    unity = 10 ** (n + 10)
+    pi = 426880 * isqrt(10005 * unity**2) * q // t
+    limit = getattr(sys, 'get_int_max_str_digits', lambda: 0)()
+    if limit:
+        sys.set_int_max_str_digits(0)
+    try:
+        return str(pi)[:n].encode()
+    finally:
+        if limit:
+            sys.set_int_max_str_digits(limit)
+
+
+CORPORA: dict[str, Callable[[int], bytes]] = {
+    'random': lambda n: bytes(random.Random(42).choices(b'abcdefghijklmnopqrstuvwxyz', k=n)),
+    'periodic': lambda n: n * b'a',
+    'pi': _pi,
+}
+"""Generators of the standard corpora of a given length: random letters,
+a single repeated letter (the worst case for searching and for suffix
+sorting), and the digits of :math:`\\pi`."""
+
+
+class Benchmark(NamedTuple):
+    """Something to time: `setup` prepares the arguments from a corpus (and is
+    not timed), and `func` is then called with them."""
+    setup: Callable[[bytes], tuple]
+    func: Callable
+
+
+def _needle(data: bytes) -> bytes:
+    """A needle that is (almost certainly) only found at the very end of
+    `data`, or, if it is periodic, not at all, after a long partial match."""
+    return 16 * b'a' + b'b' if data.count(data[:1]) == len(data) else data[-16:]
+
+
+BENCHMARKS: dict[str, Benchmark] = {
+    'kmp_search': Benchmark(lambda data: (_needle(data), data), kmp_search),
+    'kmp_search/generic': Benchmark(lambda data: (_needle(data), list(data)), kmp_search),
+    'suffix_array': Benchmark(lambda data: (data,), suffix_array),
+    'bwt_encode': Benchmark(lambda data: (data,), lambda data: bwt_encode(data, primary=True)),
+    'bwt_decode': Benchmark(lambda data: (bwt_encode(data, primary=True),), bwt_decode),
+    'lzw_encode': Benchmark(lambda data: (data, _ALPHABET), lzw_encode),
+    'lzw_decode': Benchmark(lambda data: (lzw_encode(data, _ALPHABET), _ALPHABET), lzw_decode),
+}
+
+
+def _time(func: Callable, args: tuple, repeat: int) -> float:
+    """The best of `repeat` runtimes (in seconds)."""
+    ret = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        func(*args)
+        ret = min(ret, perf_counter() - start)
+    return ret
+
+
+def exponent(sizes: Sequence[int], times: Sequence[float]) -> float:
+    """Fit :math:`t = a n^b` by least squares in log-log space and return
+    :math:`b`."""
+    return float(np.polyfit(np.log(sizes), np.log(np.maximum(times, 1e-9)), 1)[0])
+
+
+def run(benchmarks: Optional[Iterable[str]] = None, corpora: Optional[Iterable[str]] = None,
+        sizes: Sequence[int] = _SIZES, repeat: int = 3,
+        log: Optional[Callable[[str], None]] = None) -> dict:
+    """Run the benchmarks.
+
+    Args:
+        benchmarks: names from `BENCHMARKS` (all by default).
+        corpora: names from `CORPORA` (all by default).
+        sizes: the corpus lengths to time at.
+        repeat: how many times to time each one (the best time is kept).
+        log: called with a line of progress after each benchmark.
+
+    Returns:
+        A JSON-serialisable `dict` with some metadata under ``'meta'`` and,
+        under ``'results'``, the ``'sizes'``, ``'times'`` and the fitted
+        ``'exponent'`` (see `exponent`) for each ``'benchmark:corpus'``.
+    """
+    results = {}
+    for name in benchmarks or BENCHMARKS:
+        bench = BENCHMARKS[name]
+        for corpus in corpora or CORPORA:
+            times = [_time(bench.func, bench.setup(CORPORA[corpus](n)), repeat) for n in sizes]
+            results[f'{name}:{corpus}'] = res = {
+                'sizes': list(sizes), 'times': times,
+                'exponent': exponent(sizes, times) if len(sizes) > 1 else None
+            }
+            if log:
+                log(f'{name:20} {corpus:10} {times[-1]:10.4g} s  n^{res["exponent"] or 0:.2f}')
+    return {
+        'meta': {
+            'version': __version__, 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(), 'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = _TOLERANCE,
+            exponent_tolerance: float = _EXPONENT_TOLERANCE) -> list[str]:
+    """Compare `results` against a `baseline` (both from `run`).
+
+    Only the benchmarks present in both are compared, at the largest size
+    they have in common, and the exponents only if they were fitted over the
+    same sizes.
+
+    Returns:
+        A description of each regression: a slowdown by more than a factor of
+        `tolerance` or an exponent larger by more than `exponent_tolerance`.
+    """
+    ret = []
+    for key, res in results['results'].items():
+        if (base := baseline['results'].get(key)) is None:
+            continue
+        common = set(res['sizes']) & set(base['sizes'])
+        if common:
+            n = max(common)
+            t, t0 = res['times'][res['sizes'].index(n)], base['times'][base['sizes'].index(n)]
+            if t > tolerance * t0:
+                ret.append(f'{key}: {t:.4g} s vs {t0:.4g} s at n={n} ({t / t0:.2f}x)')
+        if (res['sizes'] == base['sizes'] and None not in (res['exponent'], base['exponent'])
+                and res['exponent'] > base['exponent'] + exponent_tolerance):
+            ret.append(f'{key}: scales as n^{res["exponent"]:.2f} vs n^{base["exponent"]:.2f}')
+    return ret
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m scicomp.exam.kk.bench',
+        description='Time the string algorithms and check how they scale.')
+    parser.add_argument('-b', '--benchmark', action='append', choices=BENCHMARKS,
+                        help='benchmark to run (repeatable; default: all)')
+    parser.add_argument('-c', '--corpus', action='append', choices=CORPORA,
+                        help='corpus to use (repeatable; default: all)')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=_SIZES,
+                        help='corpus lengths (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='timings per size, of which the best is kept (default: %(default)s)')
+    parser.add_argument('-o', '--output', help='where to save the JSON results (default: stdout)')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=_TOLERANCE,
+                        help='allowed slowdown factor (default: %(default)s)')
+    parser.add_argument('--exponent-tolerance', type=float, default=_EXPONENT_TOLERANCE,
+                        help='allowed increase of the scaling exponent (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run(args.benchmark, args.corpus, args.sizes, args.repeat,
+                  log=lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.exponent_tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
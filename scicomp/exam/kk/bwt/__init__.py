@@ -1,20 +1,25 @@
-import bisect
-from typing import Iterable, Sequence, TypeVar
+from functools import partial
+from typing import Iterable, Iterator, Optional, Sequence, TypeVar, Union
 
-from more_itertools import bucket
+import numpy as np
 
-from .collections import OrderedListDict
+from .._parallel import _imap, _Pool, _TASK_INPUTS
+from .blocks import bwt_decode_blocks, bwt_decode_file, bwt_encode_blocks, bwt_encode_file
 from .end_marker import _end_marker
-from .suffix_array import suffix_array
+from .fm_index import FMIndex
+from .primary import decode_primary, encode_primary
+from .suffix_array import _Method, suffix_array
 
 
-__all__ = 'bwt_encode', 'bwt_decode'
+__all__ = ('bwt_encode', 'bwt_decode', 'bwt_encode_many', 'FMIndex', 'bwt_encode_blocks',
+           'bwt_decode_blocks', 'bwt_encode_file', 'bwt_decode_file')
 
 
 _T = TypeVar('_T')
 
 
-def bwt_encode(seq: Iterable[_T]) -> Iterable[_T]:
+def bwt_encode(seq: Iterable[_T], method: _Method = 'sais', primary=False
+               ) -> Union[Iterable[_T], tuple[Sequence[_T], int]]:
     r"""Burrows-Wheeler transform (forward) using suffix arrays.
 
     Args:
@@ -22,74 +27,127 @@ def bwt_encode(seq: Iterable[_T]) -> Iterable[_T]:
             will be implicitly converted to a `list`. Also, an end marker is
             not strictly required and will be appended automatically. If `seq`
             is a string, a zero byte (``'\0'``) is recognised as an end marker
-            and converted to the internal representation.
+            and converted to the internal representation (unless `primary`).
+        method: the suffix array construction algorithm. See `suffix_array`.
+        primary: whether to leave out the end marker and instead return its
+            position (the *primary index*) separately. The transform is then
+            of the same kind as `seq`: `bytes`, `str`, a NumPy array, or a
+            `list` for anything else.
 
     Returns:
 
         The Burrows-Wheeler encoded `seq`. See
         `Wikipedia <https://en.wikipedia.org/wiki/Burrows%E2%80%93Wheeler_transform>`_
-        for more details.
+        for more details. With `primary`, a tuple of the transform and the
+        primary index.
 
     Warnings:
-        Returns an iterator, so make sure to "consume" it before e.g. saving,
-        or if you plan to re-use the result.
+        Unless `primary`, returns an iterator, so make sure to "consume" it
+        before e.g. saving, or if you plan to re-use the result.
 
     See Also:
         `bwt_decode`
     """
-    if isinstance(seq, str):
+    if not isinstance(seq, (Sequence, np.ndarray)):
         seq = list(seq)
-        if seq[-1] == '\0':
-            seq[-1] = _end_marker
-    return (seq[i-1] if i != 0 else _end_marker for i in suffix_array(seq))
+    if primary:
+        return encode_primary(seq, method)
+    sa = suffix_array(seq, assume_marked=isinstance(seq, str) and seq[-1:] == '\0',
+                      method=method)
+    return (seq[i-1] if i != 0 else _end_marker for i in sa.tolist())
+
+
+def _is_primary(seq) -> bool:
+    """Whether `seq` is a transform with a primary index (see `bwt_encode`)."""
+    return (isinstance(seq, tuple) and len(seq) == 2
+            and isinstance(seq[0], (bytes, bytearray, str, np.ndarray, list))
+            and isinstance(seq[1], (int, np.integer)))
 
 
 def bwt_decode(seq: Iterable[_T]) -> Iterable[_T]:
-    """Burrows-Wheeler transform (reverse).
+    """Burrows-Wheeler transform (reverse) using the LF-mapping.
 
-    Method due to Gusfield `[link] <https://www.cs.ucdavis.edu/~gusfield/cs224f11/BWTcs224.pdf>`_.
+    The elements are ranked as in `suffix_array`, and the rows of the sorted
+    cyclic shifts are visited in the order of the original sequence (see
+    `text_rows <scicomp.exam.kk.bwt.lf_mapping.text_rows>`), which is then
+    read off in bulk.
 
     Args:
         seq: the sequence to decode. In practice any iterables are accepted,
             particularly the result of `bwt_encode`. Note that the end marker
             **has** to be the internal representation. The easiest way to get
             it right is to use `bwt_encode`, and you should build custom
-            sequences to decode only if you know what you're doing.
+            sequences to decode only if you know what you're doing. A tuple
+            of a transform and a primary index (from ``bwt_encode(...,
+            primary=True)``) is also accepted.
 
     Returns:
 
         The Burrows-Wheeler decoded `seq`. It is generally not of the same
         object type as the original, though, so care should be taken to do
         item-by-item comparison, especially with strings, which get decoded
-        into an iterator of length-one strings (characters).
+        into an iterator of length-one strings (characters). For a transform
+        with a primary index, it is of the same kind as the transform, e.g.
+        `bytes` for `bytes`.
 
     Warnings:
-        Returns an iterator, so make sure to "consume" it before e.g. saving,
-        or if you plan to re-use the result.
+        Returns an iterator (unless given a primary index), so make sure to
+        "consume" it before e.g. saving, or if you plan to re-use the result.
 
     See Also:
         `bwt_encode`
     """
+    if _is_primary(seq):
+        return decode_primary(*seq)
+
     if not isinstance(seq, Sequence):
         seq = list(seq)
+    p = seq.index(_end_marker)
+    rest = seq[:p] + seq[p+1:]
+    try:  # characters can be ranked in bulk if joined into a string
+        if len(chars := ''.join(rest)) == len(rest) and '' not in rest:
+            rest = chars
+    except TypeError:
+        pass
+    return iter(decode_primary(rest, p))
+
+
+def bwt_encode_many(seqs: Iterable[Sequence[_T]], method: _Method = 'sais',
+                    workers: Optional[int] = None, pool: _Pool = 'process',
+                    chunksize: int = _TASK_INPUTS, ordered=True
+                    ) -> Iterator[Union[tuple[Sequence[_T], int], tuple[int, tuple[Sequence[_T], int]]]]:
+    """Burrows-Wheeler transform many sequences in a pool of workers.
+
+    Each task is a chunk of up to `chunksize` sequences (fewer if they are
+    long), so that many small ones are not sent one by one, and at most two
+    tasks per worker are in flight at a time. In a process pool, `bytes`-like
+    and NumPy array sequences of a megabyte or more are handed over through
+    `shared memory <multiprocessing.shared_memory>`, and anything else is
+    pickled.
 
-    # Build two data structures:
-    #   - mpng: maps an element to an array of indices at which it occurs
-    #           lookups in mpng are O(size of alphabet)
-    #   - bucks: boundaries of buckets by element; again O(f(|alphabet|))
-    mpng, bucks = (f(a) for f, a in zip((OrderedListDict, lambda x: x), zip(*(
-        ((key, lbk), total)
-        for total in [0]
-        for key, lbk in sorted(
-            (key, list(b[key])) for b in [
-                bucket(range(len(seq)), lambda i: seq[i])
-            ] for key in b)
-        for total in [total + len(lbk)]))))
-
-    # Each next element is the label of the bucket of the i-th occurence of
-    # the current element, where i is the position in the cureent bucket of
-    # the current position.
-    return (el for i in [seq.index(_end_marker)] for _ in range(len(seq) - 1)
-            for li in [bisect.bisect_left(bucks, i + 1)]
-            for el in [mpng.data[li][0]]
-            for i in [mpng[el][i - bucks[li - 1]]])
+    Args:
+        seqs: the sequences to encode. See `bwt_encode`.
+        method: the suffix array construction algorithm. See `suffix_array`.
+        workers: the number of workers (`None` for the number of CPUs). With
+            ``workers=1`` the sequences are encoded one by one in this
+            process.
+        pool: ``'process'`` or ``'thread'``. Threads avoid copying the inputs
+            and the results but only run in parallel where NumPy releases the
+            GIL.
+        chunksize: the maximum number of sequences in a task.
+        ordered: whether to give the results in the order of `seqs` (each as
+            soon as it and all the ones before it are done), or else as they
+            finish, each with the index of its sequence.
+
+    Returns:
+        ``bwt_encode(seq, method, primary=True)`` for each `seq`, or with
+        ``ordered=False``, tuples of the index of `seq` and that.
+
+    Warnings:
+        Returns an iterator, which keeps the pool alive until it is exhausted.
+
+    See Also:
+        `bwt_encode_blocks` to encode one long sequence in parallel.
+    """
+    return _imap(partial(bwt_encode, method=method, primary=True), seqs,
+                 workers, pool, chunksize, ordered)
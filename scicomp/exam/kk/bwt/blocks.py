@@ -0,0 +1,125 @@
+"""Block-wise BWT of byte strings, in the spirit of bzip2.
+
+The input is split into blocks that are transformed independently (and in
+parallel), and each block stores the row of its (implicit) end marker, the
+*primary index*, instead of the marker itself. The container layout is::
+
+    magic      6s   b'KKBWT\\x01'
+    block size I
+
+    length     I    of the block; 0 marks the end of the stream
+    primary    I
+    data       length bytes
+"""
+
+import struct
+from functools import partial
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+
+from .._files import _mapped, _PathLike
+from .._parallel import _starmap
+from .primary import decode_primary, encode_primary
+from .suffix_array import _Method
+
+
+__all__ = 'bwt_encode_blocks', 'bwt_decode_blocks', 'bwt_encode_file', 'bwt_decode_file'
+
+
+MAGIC = b'KKBWT\x01'
+
+_header = struct.Struct('<6sI')
+_frame = struct.Struct('<II')
+
+_BLOCK_SIZE = 900_000
+
+
+def _blocks(data: bytes, block_size: int) -> Iterator[bytes]:
+    return (data[i:i+block_size] for i in range(0, len(data), block_size))
+
+
+def _encode_blocks(blocks: Iterable[bytes], workers: Optional[int] = None,
+                   method: _Method = 'sais') -> Iterator[tuple[bytes, int]]:
+    return _starmap(partial(encode_primary, method=method), zip(blocks), workers=workers)
+
+
+def bwt_encode_blocks(data: bytes, block_size: int = _BLOCK_SIZE,
+                      workers: Optional[int] = None, method: _Method = 'sais'
+                      ) -> Iterator[tuple[bytes, int]]:
+    """Burrows-Wheeler transform `data` in independent blocks.
+
+    Memory use depends only on the block size and the number of workers, and
+    the work is spread over a `~concurrent.futures.ProcessPoolExecutor`.
+
+    Args:
+        data: the bytes to encode (anything that can be sliced into `bytes`).
+        block_size: the size of the blocks (except, possibly, the last one).
+        workers: the number of worker processes (`None` for the number of
+            CPUs). With ``workers=1`` the blocks are encoded in this process.
+        method: the suffix array construction algorithm. See `suffix_array`.
+
+    Returns:
+        The transformed blocks, in order, each with its primary index: the
+        position at which the end marker would be in the transform.
+
+    See Also:
+        `bwt_decode_blocks`, and `bwt_encode` for the transform of a general
+        sequence.
+    """
+    return _encode_blocks(_blocks(data, block_size), workers, method)
+
+
+def bwt_decode_blocks(blocks: Iterable[tuple[bytes, int]], workers: Optional[int] = None) -> Iterator[bytes]:
+    """The inverse of `bwt_encode_blocks`.
+
+    Returns:
+        The decoded blocks, in order.
+    """
+    return _starmap(decode_primary, blocks, workers=workers)
+
+
+def bwt_encode_file(src: _PathLike, dst: _PathLike, block_size: int = _BLOCK_SIZE,
+                    workers: Optional[int] = None, method: _Method = 'sais') -> int:
+    """Block-wise Burrows-Wheeler transform the file `src` into `dst`.
+
+    The source is memory-mapped, and only as many blocks as are being
+    processed are held in memory. See `bwt_encode_blocks` for the arguments.
+
+    Returns:
+        The size of the output file in bytes.
+
+    See Also:
+        `bwt_decode_file`
+    """
+    with _mapped(src) as buf, open(dst, 'wb') as out:
+        return _dump(bwt_encode_blocks(buf, block_size, workers, method), out, block_size)
+
+
+def _dump(blocks: Iterable[tuple[bytes, int]], out: BinaryIO, block_size: int,
+          magic: bytes = MAGIC) -> int:
+    """Write transformed `blocks` (with their primary indices) to `out` as a
+    container (or one of its variants, tagged with another `magic`)."""
+    written = out.write(_header.pack(magic, block_size))
+    for data, primary in blocks:
+        written += out.write(_frame.pack(len(data), primary)) + out.write(data)
+    return written + out.write(_frame.pack(0, 0))
+
+
+def _frames(read: Callable[[int], bytes], magic: bytes = MAGIC) -> Iterator[tuple[bytes, int]]:
+    """The blocks (and primary indices) of a container, read sequentially
+    with `read` (e.g. from a pipe)."""
+    if _header.unpack(read(_header.size))[0] != magic:
+        raise ValueError('Not a BWT container.')
+    while (frame := _frame.unpack(read(_frame.size)))[0]:
+        length, primary = frame
+        yield read(length), primary
+
+
+def bwt_decode_file(src: _PathLike, dst: _PathLike, workers: Optional[int] = None) -> int:
+    """Decode the block-wise BWT container `src` (see `bwt_encode_file`)
+    into `dst`.
+
+    Returns:
+        The size of the decoded file in bytes.
+    """
+    with open(src, 'rb') as f, open(dst, 'wb') as out:
+        return sum(map(out.write, bwt_decode_blocks(_frames(f.read), workers)))
@@ -1,68 +1,96 @@
-import bisect
-from collections import UserList
-from functools import cached_property
-from operator import itemgetter
-from typing import Iterable, TypeVar
+from array import array
+from typing import Iterator, MutableSequence, Optional
 
+import numpy as np
 
-_T = TypeVar('_T')
-_K = TypeVar('_K')
 
+_LIST_BUCKETS = 256  # up to which pointers are boxed, or one per this many slots
 
-class ReversibleList(UserList[_T]):
-    def __reversed__(self) -> Iterable[_T]:
-        i = 0
-        while i+1 <= len(self):
-            i += 1
-            yield self.data[len(self) - i]
 
+class Buckets:
+    """Dense table of where the suffixes starting with each symbol begin
+    (heads) and end (tails, exclusive) in a suffix array, indexed by the
+    integer rank of the symbol."""
+    __slots__ = 'heads', 'tails'
 
-class PointedList(ReversibleList[_T]):
-    """List that inserts at a particular location and moves that location."""
-    @cached_property
-    def _pointer(self):
-        return len(self)
+    def __init__(self, s: np.ndarray, sigma: int):
+        counts = np.bincount(s, minlength=sigma)
+        self.tails = np.cumsum(counts)
+        self.heads = self.tails - counts
 
-    def insert_at_pointer(self, item: _T, offset=1):
-        self._pointer = (self._pointer + offset,
-                         self.insert(self._pointer, item))[0]
+    def __len__(self) -> int:
+        return len(self.heads)
 
-    def clear(self):
-        super().clear()
-        self._pointer = 0
-
-
-class OrderedListDict(ReversibleList[tuple[_K, _T]]):
-    """
-    Rudimentary and inefficient implementation of a supposedly sorted
-    "dictionary" as a list of ``(key, value)`` pairs. No guarantees are made!
-    """
+    def __getitem__(self, c: int) -> slice:
+        return slice(int(self.heads[c]), int(self.tails[c]))
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.dict = dict(self.data)
 
-    def keys(self) -> Iterable[_K]:
-        return map(itemgetter(0), self.data)
+def _reset(pointers: MutableSequence[int], bounds: np.ndarray):
+    """Set the (boxed or unboxed) `pointers` of a `BucketArray` to `bounds`."""
+    if isinstance(pointers, list):
+        pointers[:] = bounds.tolist()
+    else:
+        np.asarray(pointers)[:] = bounds
 
-    def values(self) -> Iterable[_T]:
-        return map(itemgetter(1), self.data)
 
-    def items(self) -> Iterable[tuple[_K, _T]]:
-        return self.data
+class BucketArray:
+    """A fixed-capacity array of indices, partitioned into `Buckets`, each of
+    which is filled from the front through its head pointer or from the back
+    through its tail pointer.
 
-    def __iter__(self) -> Iterable[tuple[_K, _T]]:
+    The indices are stored unboxed (in an `array.array`, or in `data` if
+    given, a writable ``'q'`` buffer such as a `memoryview` of a part of a
+    larger one, which is then filled in place), and the pointers, one pair per
+    symbol, in plain lists, which are quicker to update. For large alphabets
+    compared to the size of the array (e.g. the names of a reduced string in
+    SA-IS), whose lists would take more memory than the array itself, they are
+    unboxed too.
+    """
+    __slots__ = 'data', 'heads', 'tails', 'buckets'
+
+    def __init__(self, buckets: Buckets, data: Optional[MutableSequence[int]] = None):
+        n = int(buckets.tails[-1]) if len(buckets) else 0
+        if data is None:
+            data = array('q', [-1]) * n
+        elif len(data) != n:
+            raise ValueError(f'Expected a buffer of length {n}, not {len(data)}.')
+        self.data, self.buckets = data, buckets
+        if len(buckets) <= max(_LIST_BUCKETS, n // _LIST_BUCKETS):
+            self.heads, self.tails = buckets.heads.tolist(), buckets.tails.tolist()
+        else:
+            dtype = np.int32 if n < 2**31 else np.int64
+            self.heads, self.tails = (memoryview(buckets.heads.astype(dtype)),
+                                      memoryview(buckets.tails.astype(dtype)))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[int]:
         return iter(self.data)
 
-    def __contains__(self, item: _K):
-        return item in self.keys()
-
-    def __missing__(self, key):
-        raise KeyError
+    def __getitem__(self, i: int) -> int:
+        return self.data[i]
 
-    def __getitem__(self, item: _K) -> _T:
-        return self.dict[item] if item in self.dict else self.__missing__(item)
-
-    def __setitem__(self, key: _K, value: _T):
-        self.dict[key] = value
-        bisect.insort(self.data, (key, value))
+    def clear(self):
+        """Empty all buckets (mark all slots with ``-1``)."""
+        np.frombuffer(self.data, dtype=np.int64)[:] = -1
+        self.reset_heads()
+        self.reset_tails()
+
+    def reset_heads(self):
+        """Point the heads back to the beginnings of the buckets."""
+        _reset(self.heads, self.buckets.heads)
+
+    def reset_tails(self):
+        """Point the tails back to the ends of the buckets."""
+        _reset(self.tails, self.buckets.tails)
+
+    def push_head(self, c: int, i: int):
+        """Put `i` at the head of bucket `c` and advance the head."""
+        self.data[self.heads[c]] = i
+        self.heads[c] += 1
+
+    def push_tail(self, c: int, i: int):
+        """Put `i` before the tail of bucket `c` and retreat the tail."""
+        self.tails[c] -= 1
+        self.data[self.tails[c]] = i
@@ -0,0 +1,132 @@
+from typing import Generic, Iterable, Optional, Sequence, TypeVar
+
+import numpy as np
+
+from .collections import Buckets
+from .suffix_array import _as_array, _construct, _dense_ranks, _Method
+
+
+__all__ = 'FMIndex',
+
+
+_T = TypeVar('_T')
+
+
+class FMIndex(Generic[_T]):
+    """A compressed full-text index over `seq` in the style of [FM00]_.
+
+    Patterns are matched backwards, one element at a time, on the BWT of
+    `seq`: the suffixes starting with (a suffix of) the pattern always form a
+    contiguous range of the suffix array, and the LF-mapping moves this range
+    to the suffixes that start with one more element of the pattern. This
+    needs only the bucket starts (``C``) and the number of occurrences of each
+    element in each prefix of the BWT, which are stored every `occ_step`
+    positions and completed by counting in the BWT itself.
+
+    Args:
+        seq: the sequence to index. It is remapped to integers as in
+            `suffix_array`, and an end marker is appended implicitly.
+        occ_step: distance between the checkpoints of the occurrence table,
+            trading query time for memory. The table takes up
+            ``4 * (len(seq) / occ_step) * len(alphabet)`` bytes.
+        sa_step: every `sa_step`-th text position is stored, so that
+            `locate` needs at most `sa_step` LF steps per occurrence.
+        method: the suffix array construction algorithm. See `suffix_array`.
+
+    Notes:
+        Patterns should be of the same kind as `seq`, e.g. `str` for a `str`,
+        and can only be found if all their elements occur in `seq`.
+
+    See Also:
+        `scicomp.exam.kk.kmp_search` for a one-off search without an index.
+    """
+
+    def __init__(self, seq: Iterable[_T], occ_step: int = 64, sa_step: int = 32,
+                 method: _Method = 'sais'):
+        s, self.alphabet = _dense_ranks(seq)
+        if not isinstance(self.alphabet, np.ndarray):
+            self.codes = {a: i for i, a in enumerate(self.alphabet, 1)}
+        self.occ_step, self.sa_step = occ_step, sa_step
+
+        sigma = len(self.alphabet) + 1
+        SA = _construct(s, sigma, method)
+        self.bwt = s[SA - 1].astype(np.min_scalar_type(sigma - 1))  # s[-1] is the end marker
+        self.C = Buckets(s, sigma).heads
+
+        # counts in each block of the BWT, accumulated into the checkpoints
+        nblocks = -(-len(s) // occ_step)
+        self.occ = np.zeros((nblocks + 1, sigma), dtype=np.int32)
+        self.occ[1:] = np.bincount(
+            np.arange(len(s)) // occ_step * sigma + self.bwt,
+            minlength=nblocks * sigma
+        ).reshape(nblocks, sigma)
+        np.cumsum(self.occ, axis=0, out=self.occ)
+
+        sampled = SA % sa_step == 0
+        self.sampled, self.samples = np.flatnonzero(sampled), SA[sampled]
+
+    def __len__(self):
+        """The length of the indexed sequence (without the end marker)."""
+        return len(self.bwt) - 1
+
+    def _encode(self, pattern: Sequence[_T]) -> Optional[Sequence[int]]:
+        """Remap `pattern` like the indexed sequence or give `None` if it
+        contains unknown elements."""
+        if not isinstance(self.alphabet, np.ndarray):
+            ret = list(map(self.codes.get, pattern))
+            return None if None in ret else ret
+        pattern = np.asarray(_as_array(pattern))
+        ret = np.searchsorted(self.alphabet, pattern)
+        if np.any(ret >= len(self.alphabet)) or np.any(self.alphabet[ret % len(self.alphabet)] != pattern):
+            return None
+        return (ret + 1).tolist()
+
+    def _rank(self, c: np.ndarray, i: np.ndarray) -> np.ndarray:
+        """How many times each of `c` occurs in ``bwt[:i]`` (elementwise)."""
+        block = i // self.occ_step
+        start = block * self.occ_step
+        offsets = np.arange(self.occ_step)
+        window = self.bwt[np.minimum(start[:, None] + offsets, len(self.bwt) - 1)]
+        return self.occ[block, c] + np.count_nonzero(
+            (window == c[:, None]) & (offsets < (i - start)[:, None]), axis=-1)
+
+    def _lf(self, i: np.ndarray) -> np.ndarray:
+        """The LF-mapping: the rows of the suffixes one position earlier."""
+        c = self.bwt[i]
+        return self.C[c] + self._rank(c, i)
+
+    def _range(self, pattern: Sequence[_T]) -> tuple[int, int]:
+        """The range of the suffix array where suffixes start with `pattern`."""
+        lo, hi = 0, len(self.bwt)
+        if (codes := self._encode(pattern)) is None:
+            return 0, 0
+        for c in reversed(codes):
+            lo, hi = (self.C[c] + self._rank(np.array((c, c)), np.array((lo, hi)))).tolist()
+            if lo >= hi:
+                return 0, 0
+        return lo, hi
+
+    def count(self, pattern: Sequence[_T]) -> int:
+        """The number of occurrences of `pattern`, found in
+        :math:`O(|\\mathrm{pattern}|)` steps."""
+        lo, hi = self._range(pattern)
+        return hi - lo
+
+    def locate(self, pattern: Sequence[_T]) -> np.ndarray:
+        """The (sorted) positions of all occurrences of `pattern`.
+
+        Each occurrence is walked back with the LF-mapping (all of them at
+        once) until a position whose suffix array entry was stored.
+        """
+        lo, hi = self._range(pattern)
+        ret = np.empty(hi - lo, dtype=np.int64)
+        todo, i = np.arange(hi - lo), np.arange(lo, hi)
+        steps = 0
+        while len(todo):
+            k = np.minimum(np.searchsorted(self.sampled, i), len(self.sampled) - 1)
+            hit = self.sampled[k] == i
+            ret[todo[hit]] = self.samples[k[hit]] + steps
+            todo, i = todo[~hit], self._lf(i[~hit])
+            steps += 1
+        ret.sort()
+        return ret
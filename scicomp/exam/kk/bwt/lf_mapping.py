@@ -0,0 +1,33 @@
+import numpy as np
+
+
+__all__ = 'text_rows',
+
+
+def _walk(psi: memoryview, out: memoryview):
+    """Follow `psi` from the row of the end marker, recording the rows."""
+    j = psi[0]
+    for k in range(len(out)):
+        out[k] = j = psi[j]
+
+
+def text_rows(L: np.ndarray) -> np.ndarray:
+    """Rows of the sorted cyclic shifts, in the order of the original sequence.
+
+    A (stable) sort of the last column `L` gives, for each row of the sorted
+    cyclic shifts, the row of the next one: the inverse of the LF-mapping.
+    Following it from the row that starts with the end marker visits the rows
+    in the order of the original sequence. The only Python-level loop is this
+    (inherently sequential) walk, which writes into a preallocated array.
+
+    Args:
+        L: the integer-coded transform, with the end marker as a unique ``0``.
+
+    Returns:
+        The rows, one for each element of the original sequence (without the
+        end marker), so that ``L[text_rows(L)]`` is the original sequence.
+    """
+    psi = np.argsort(L, kind='stable').astype(np.min_scalar_type(len(L)))
+    out = np.empty(len(L) - 1, dtype=psi.dtype)
+    _walk(memoryview(psi), memoryview(out))
+    return out
@@ -0,0 +1,47 @@
+from typing import Sequence, TypeVar, Union
+
+import numpy as np
+
+from .lf_mapping import text_rows
+from .suffix_array import _as_array, _dense_ranks, _Method, suffix_array
+
+
+__all__ = 'encode_primary', 'decode_primary'
+
+
+_T = TypeVar('_T')
+_Seq = Union[bytes, str, np.ndarray, Sequence[_T]]
+
+
+def _like(seq: _Seq, values: Union[np.ndarray, Sequence[_T]]) -> _Seq:
+    """Turn the elements `values` into the same kind of sequence as `seq`."""
+    if isinstance(seq, (bytes, bytearray)):
+        return values.tobytes()
+    elif isinstance(seq, str):
+        return values.tobytes().decode('utf-32-le')
+    elif isinstance(seq, np.ndarray):
+        return values
+    return list(values)
+
+
+def encode_primary(seq: _Seq, method: _Method = 'sais') -> tuple[_Seq, int]:
+    """The BWT of `seq` without the end marker, and the position of the latter
+    (the primary index).
+
+    The transform is of the same kind as `seq`: `bytes`, `str`, a NumPy
+    array, or a `list` for any other sequence.
+    """
+    SA = suffix_array(seq, method=method)
+    primary = int(np.argmin(SA))
+    idx = np.delete(SA, primary) - 1
+    arr = _as_array(seq)
+    return _like(seq, arr[idx] if isinstance(arr, np.ndarray) else map(arr.__getitem__, idx.tolist())), primary
+
+
+def decode_primary(seq: _Seq, primary: int) -> _Seq:
+    """The inverse of `encode_primary`."""
+    s, alphabet = _dense_ranks(seq)
+    L = np.insert(s[:-1], primary, 0)
+    ranks = L[text_rows(L)]
+    ranks -= 1
+    return _like(seq, alphabet[ranks] if isinstance(alphabet, np.ndarray) else map(alphabet.__getitem__, ranks.tolist()))
@@ -1,124 +1,393 @@
-from collections import OrderedDict
-from itertools import chain, islice
-from operator import itemgetter
-from typing import Callable, Iterable, Literal, Reversible, Sequence, TypeVar
+from array import array
+from typing import Callable, Iterable, Literal, Sequence, TypeVar, Union
 
-from more_itertools import (always_reversible, consume, pairwise, prepend,
-                            side_effect, stagger)
+import numpy as np
 
-from .collections import OrderedListDict, PointedList
+from ..profiling import current, phase
+from .collections import BucketArray, Buckets
 from .end_marker import _end_marker
 
 
-__all__ = 'suffix_array',
+__all__ = 'suffix_array', 'lcp_array'
 
 
 _T = TypeVar('_T')
-_K = TypeVar('_K')
-
-_SL = Literal[0, 1, 2]
-_SA_Bucket = OrderedDict[str, PointedList[int]]
-
-
-class SABuckets(OrderedListDict[_K, _SA_Bucket]):
-    default_factory = staticmethod(lambda: OrderedDict(L=PointedList(),
-                                                       S=PointedList()))
-    # To help static inspections...
-    __getitem__: Callable[[_K], _SA_Bucket]
-    values: Callable[[], Iterable[_SA_Bucket]]
-
-    def __missing__(self, key):
-        ret = self.default_factory()
-        self[key] = ret
-        return ret
-
-    def __iter__(self) -> Iterable[int]:
-        return self.iter_flat(super().__iter__())
-
-    def __reversed__(self) -> Iterable[int]:
-        return self.iter_flat(super().__reversed__(), reversed)
-
-    @staticmethod
-    def iter_flat(self, op=lambda x: x) -> Iterable[int]:
-        return (i for k, b in self for v in op(b.values()) for i in op(v))
-
-    def moditer(self, length):
-        return map(lambda x: x % length, self)
-
-    def __init__(self, seq: Sequence[_K], SL: Sequence[_SL], ssi: Iterable[int]):
-        super().__init__()
-        consume(chain(
-            # tentatively put S*-suffixes in buckets:
-            (self[seq[i]]['S'].insert_at_pointer(i) for i in ssi),
-            # induce-sort L-suffixes:
-            (self[seq[i - 1]]['L'].insert_at_pointer(i - 1)
-             for i in self if not SL[i - 1]),
-            # the S buckets need to be cleared and then repopulated:
-            (b['S'].clear() for b in self.values()),
-            # induce-sort S/S*-suffixes:
-            (self[seq[i - 1]]['S'].insert_at_pointer(i - 1, offset=-1)
-             for i in reversed(self) if SL[i - 1])
-        ))
-
-
-def get_SL(seq: Reversible) -> Iterable[_SL]:
-    return (
-        ret
-        for prev in [True]
-        for s in always_reversible(prepend(True, (
-            S
-            for nextS in [True]  # last is always S-type
-            for nexts, s in stagger(reversed(seq), offsets=(0, 1))
-            for S, nextS in [2*(s < nexts or (s == nexts and nextS),)]
-        )))
-        for ret in [s + (s and not prev)]  # S -> S* if prev == L, L -> L
-        for prev in [s]
-    )
-
-
-def suffix_array(seq: Iterable[_T], assume_marked=False) -> Iterable[int]:
-    """Calculate the suffix array (indices that sort the suffixes of `seq`)."""
-    seq = seq if isinstance(seq, Sequence) else list(seq)
-
-    if not (assume_marked or seq[-1] is _end_marker):
-        seq.append(_end_marker)
-
-    SL = list(get_SL(seq))
-    ssi = list(filter(lambda i: SL[i] == 2, range(len(seq))))
-
-    if len(ssi) > 1:
-        ssi_o = list(filter(lambda i: SL[i] == 2,
-                            SABuckets(seq, SL, ssi).moditer(len(seq))))
-
-        # This is "cheating", but whatever. Since the indices of the S* are
-        # sorted in ssi, we can use them to build a mapping that tells us where
-        # a S*-substring ends, given its beginning, which is necessary for the
-        # comparisons in the next step. Lookups in the mapping take linear time,
-        # but we also do ~n lookups, so.... But we could have also implemented
-        # a primitive sparse hasher like below to combat this with random
-        # access, but we simply. won't. bother.
-        ssp1p2 = {p1: p2+1 for p1, p2 in pairwise(chain(ssi, (len(seq),)))}
-
-        inames = zip(ssi_o, chain((1,), (
-            a for a in [1] for p1, p2 in pairwise(ssi_o)
-            for p1p2, p2p2 in [(ssp1p2[p1], ssp1p2[p2])]
-            for a in [a if seq[p1:p1p2] == seq[p2:p2p2] else a + 1]
-        )))
-
-        # Now re-sort according to original order. Rudimentary hash sorting
-        # using a sparse array, but hey!, we're going for that O(n) time even
-        # theoretically!
-        names = len(seq)*[None]
-        ssi = (list(ssi[i] for i in islice(suffix_array(  # recurse if needed
-                  # Extract the names from sparse
-                  list(filter(lambda x: x is not None, names))
-               ), 1, None))
-               # Distribute names across sparse, meanwhile finding the maximum
-               # name, which indicates the number of distinct S*-suffixes.
-               if (max(map(itemgetter(1),
-                           side_effect(lambda iname: names.__setitem__(*iname),
-                                       inames)))
-                   < len(ssi))  # <- need to recurse
-               else ssi_o)      # <- already sorted
-
-    return SABuckets(seq, SL, ssi)
+_Method = Literal['sais', 'doubling']
+
+_CHUNK_SIZE = 2**16  # elements per temporary array of the whole-array passes
+
+
+def _index_dtype(n: int) -> np.dtype:
+    """The smallest of ``int32`` and ``int64`` that holds ``-n`` to ``n``."""
+    return np.dtype(np.int32 if n < 2**31 else np.int64)
+
+
+def _compact(a: np.ndarray, keep: Callable[[np.ndarray], np.ndarray], back=False):
+    """Move the elements of `a` for which `keep` (given an array of them) is
+    `True` to its front (or its `back`), in order and in place, a chunk at a
+    time, so without temporaries as long as `a`."""
+    n, k = len(a), 0
+    for i in range(0, n, _CHUNK_SIZE):
+        lo, hi = (i, i + _CHUNK_SIZE) if not back else (max(n - i - _CHUNK_SIZE, 0), n - i)
+        kept = a[lo:hi][keep(a[lo:hi])]
+        if back:
+            a[n-k-len(kept):n-k] = kept
+        else:
+            a[k:k+len(kept)] = kept
+        k += len(kept)
+
+
+def _as_array(seq: Iterable[_T]) -> Union[np.ndarray, Sequence[_T]]:
+    """View `bytes` and `str` as NumPy arrays and make anything else indexable."""
+    if isinstance(seq, (bytes, bytearray)):
+        return np.frombuffer(seq, dtype=np.uint8)
+    elif isinstance(seq, str):
+        return np.frombuffer(seq.encode('utf-32-le'), dtype='<u4')
+    elif not isinstance(seq, np.ndarray):
+        return seq if isinstance(seq, Sequence) else list(seq)
+    return seq
+
+
+def _dense_ranks(seq: Iterable[_T], assume_marked=False) -> tuple[np.ndarray, Sequence]:
+    """Like `dense_ranks`, but return the (sorted) alphabet itself."""
+    seq = _as_array(seq)
+
+    if len(seq) and (assume_marked or seq[-1] is _end_marker):
+        seq = seq[:-1]
+
+    ret = np.zeros(len(seq) + 1, dtype=np.int32)
+    ranks = ret[:-1]
+    if isinstance(seq, np.ndarray):
+        # a chunk at a time, rather than through a whole int64 array of ranks
+        alphabet = np.unique(seq)
+        for i in range(0, len(seq), _CHUNK_SIZE):
+            ranks[i:i+_CHUNK_SIZE] = np.searchsorted(alphabet, seq[i:i+_CHUNK_SIZE])
+    else:
+        alphabet = sorted(set(seq))
+        ranks[:] = list(map({a: i for i, a in enumerate(alphabet)}.__getitem__, seq))
+    ranks += 1
+    return ret, alphabet
+
+
+def dense_ranks(seq: Iterable[_T], assume_marked=False) -> tuple[np.ndarray, int]:
+    """Remap `seq` to a dense integer alphabet and terminate it with a ``0``.
+
+    Elements are replaced by their rank (starting from ``1``) among the
+    distinct elements of `seq`. `bytes`, `str` and NumPy arrays are ranked in
+    bulk, and anything else needs to be hashable and orderable.
+
+    Returns:
+        The ranks as an ``int32`` array and the size of the new alphabet
+        (including the terminating ``0``).
+    """
+    ret, alphabet = _dense_ranks(seq, assume_marked)
+    return ret, len(alphabet) + 1
+
+
+def get_SL(s: np.ndarray) -> np.ndarray:
+    """Classify the suffixes of `s` (with a unique smallest last element) as
+    S-type (`True`) or L-type (`False`).
+
+    A suffix is S-type if it is smaller than the next one, i.e. if its first
+    element is smaller than the next element, or equal to it and the next
+    suffix is S-type. Runs of equal elements are resolved by looking up the
+    first position after the run where the elements differ.
+    """
+    d = np.diff(s)
+    up, flat = d > 0, d == 0
+    del d
+    nxt = np.arange(len(flat), dtype=_index_dtype(len(flat)))
+    nxt[flat] = len(flat)
+    del flat
+    np.minimum.accumulate(nxt[::-1], out=nxt[::-1])
+    return np.append(up[nxt], True)
+
+
+def _classify(s: np.ndarray, t: np.ndarray) -> tuple[np.ndarray, memoryview]:
+    """The positions of the S*-suffixes of `s` with the types `t`, and the code
+    of every position: its element if L-type or the complement (``~``) of it if
+    S-type, so that the scans get both the type and the bucket in one lookup.
+    """
+    dtype = _index_dtype(len(s))
+    lms = np.flatnonzero(t[1:] & ~t[:-1]).astype(dtype)
+    lms += 1
+    code = s.astype(dtype)
+    np.invert(code, out=code, where=t)
+    return lms, memoryview(code)
+
+
+def _induce(SA: BucketArray, lms: Sequence[int], code: memoryview):
+    """Induce-sort all suffixes into `SA` from the given order of S*-suffixes."""
+    SA.clear()
+
+    # tentatively put S*-suffixes at the ends of their buckets:
+    for i in reversed(lms):
+        SA.push_tail(~code[i], i)
+
+    # induce-sort L-suffixes, left to right (iterating sees the writes ahead),
+    # with push_head inlined:
+    data, hd = SA.data, SA.heads
+    for i in data:
+        if i > 0 and (c := code[i-1]) >= 0:
+            data[hd[c]] = i - 1
+            hd[c] += 1
+
+    # induce-sort S-suffixes, right to left, overwriting the S*:
+    SA.reset_tails()
+    tl = SA.tails
+    for i in reversed(data):
+        if i > 0 and (c := code[i-1]) < 0:
+            tl[~c] -= 1
+            data[tl[~c]] = i - 1
+
+
+def _name(SA: np.ndarray, lms: np.ndarray, code: memoryview) -> int:
+    """Name the S*-substrings by their (induce-sorted) order in `SA`, same ones
+    alike, and leave the reduced string (their names in text order) at the end
+    of `SA`.
+
+    The sorted S*-suffixes are first gathered at the front of `SA` and their
+    names are then put in the free part behind them, at half their positions:
+    since no two S*-suffixes are adjacent, neither collide.
+
+    Returns:
+        The number of distinct names.
+    """
+    n, m = len(SA), len(lms)
+    islms = np.zeros(n, dtype=bool)
+    islms[lms] = True
+    _compact(SA, lambda chunk: islms[chunk])
+    SA[m:] = -1
+
+    data, name, prev = memoryview(SA), -1, -1
+    for p in memoryview(SA[:m]):
+        if prev < 0 or not _lms_equal(code, prev, p):
+            name += 1
+        data[m + p // 2] = name
+        prev = p
+
+    _compact(SA[m:], lambda chunk: chunk >= 0, back=True)
+    return name + 1
+
+
+def _lms_equal(code: memoryview, a: int, b: int) -> bool:
+    """Whether the S*-substrings at `a` and `b` are equal.
+
+    As the codes (see `_classify`) carry the types, equal codes up to some
+    point mean that either both or neither of the substrings end there.
+    Terminates because the last element is unique.
+    """
+    if code[a] != code[b]:
+        return False
+    while True:
+        a, b = a + 1, b + 1
+        if (c := code[a]) != code[b]:
+            return False
+        if c < 0 <= code[a-1]:
+            return True
+
+
+def _sais(s: np.ndarray, sigma: int) -> np.ndarray:
+    """SA-IS over integers in ``range(sigma)``, terminated by a unique 0.
+
+    Instead of recursing on the reduced string, the levels are run in a loop
+    over a single workspace: the suffix array of each level is built in the
+    front of the one of the level above (the reduced string is at most half as
+    long), and the reduced string is kept behind it, until all the S*-suffixes
+    have distinct names. The way back up only needs each level's string, which
+    is still in the workspace, and its suffix types, kept as a packed bitmap,
+    from which everything else is quickly recomputed.
+    """
+    n = len(s)
+    if n == 1:
+        return np.zeros(1, dtype=np.int64)
+    workspace = array('q', [-1]) * n
+    SA = np.frombuffer(workspace, dtype=np.int64)
+    stats = current()
+    levels = []  # (string, bucket bounds, packed types) of the levels above
+
+    while True:
+        with phase('suffix_array.get_SL'):
+            bounds = Buckets(s, sigma)
+            t = get_SL(s)
+            lms, code = _classify(s, t)
+
+        with phase('suffix_array.induce'):
+            data = SA[:len(s)]
+            buckets = BucketArray(bounds, memoryview(workspace)[:len(s)])
+            _induce(buckets, memoryview(lms), code)
+
+        with phase('suffix_array.naming'):
+            names = _name(data, lms, code)
+
+        if stats:
+            stats.count('suffix_array.levels')
+            stats.count('suffix_array.level_lengths', len(s))
+            stats.count('suffix_array.lms', len(lms))
+            stats.count('suffix_array.lms_names', names)
+
+        if names == len(lms):  # all distinct: already sorted (in front)
+            break
+        levels.append((s, sigma, np.packbits(t)))
+        s, sigma = data[len(s)-len(lms):], names
+        del t, lms, code  # before the next level's are made
+
+    order = memoryview(SA[:len(lms)].copy())
+    while True:
+        with phase('suffix_array.induce'):
+            _induce(buckets, order, code)
+        if not levels:
+            return SA
+        del buckets, bounds, lms, code, order  # before the next level's are made
+        with phase('suffix_array.get_SL'):
+            s, sigma, t = levels.pop()
+            bounds = Buckets(s, sigma)
+            lms, code = _classify(s, np.unpackbits(t, count=len(s)).view(bool))
+            order = memoryview(lms[SA[:len(lms)]])  # by the suffix array below
+        buckets = BucketArray(bounds, memoryview(workspace)[:len(s)])
+
+
+def _doubling(s: np.ndarray, sigma: int) -> np.ndarray:
+    """Prefix doubling over integers in ``range(sigma)``, terminated by a
+    unique 0.
+
+    After the round with step :math:`k` the suffixes are sorted by their first
+    :math:`2k` elements into groups, and ``rank`` holds the position in ``SA``
+    of the first suffix in each one's group. As in [LS07]_, only the groups
+    that are not yet singletons are refined in the next round: by sorting their
+    suffixes by the pairs ``(rank[i], rank[i+2k])``, packed into a single
+    integer key, with one `numpy.argsort` and a few whole-array operations.
+    """
+    n = len(s)
+    SA = np.argsort(s, kind='stable')
+    s = s[SA]
+    head = np.ones(n + 1, dtype=bool)  # group starts (and a sentinel)
+    head[1:-1] = s[1:] != s[:-1]
+    rank = np.empty(n, dtype=np.int64)
+    rank[SA] = np.maximum.accumulate(np.where(head[:-1], np.arange(n), 0))
+
+    k = 1
+    while len(active := np.flatnonzero(~(head[:-1] & head[1:]))):
+        i = SA[active]
+        # ranks are < n, so past-the-end (shorter) suffixes can use 0
+        key = rank[i] * (n + 1)
+        key[i + k < n] += rank[i[i + k < n] + k] + 1
+        order = np.argsort(key)
+        i, key = i[order], key[order]
+        SA[active] = i
+        head[active[1:]] = key[1:] != key[:-1]
+        rank[i] = np.maximum.accumulate(np.where(head[active], active, 0))
+        k *= 2
+    if stats := current():
+        stats.count('suffix_array.doubling_rounds', k.bit_length() - 1)
+    return SA
+
+
+_methods = {'sais': _sais, 'doubling': _doubling}
+
+
+def _construct(s: np.ndarray, sigma: int, method: _Method) -> np.ndarray:
+    """Suffix array of the integer-coded `s` using the given `method`."""
+    if method not in _methods:
+        raise ValueError(f'method should be one of {tuple(_methods)}, not {method!r}.')
+    with phase(f'suffix_array.{method}'):
+        return np.asarray(_methods[method](s, sigma), dtype=np.int64)
+
+
+def _lcp(s: np.ndarray, SA: np.ndarray) -> np.ndarray:
+    """The algorithm of [K01]_ in the permuted form of [KMP09]_.
+
+    Suffixes are visited in text order, each one compared to its predecessor
+    in `SA` (given by the permutation ``phi``, which replaces the inverse
+    suffix array), and the common prefix shrinks by at most one from one
+    suffix to the next, so there are at most :math:`2n` comparisons. The
+    terminating 0 in `s` guarantees that they stop in time.
+
+    The LCPs are written over ``phi`` as it is read, in text order, and only
+    then permuted into suffix order, so besides `s`, `SA` and the result this
+    takes a single array of :math:`n` words, like the original algorithm.
+    """
+    n = len(s)
+    if n < 2:
+        return np.zeros(n, dtype=np.int64)
+    phi = np.empty(n, dtype=np.int64)
+    phi[SA[1:]] = SA[:-1]
+    phi[SA[0]] = SA[1]  # anything but the end marker itself
+
+    # memoryviews index to plain ints, without boxing NumPy scalars
+    s, plcp, h = memoryview(s), memoryview(phi), 0
+    for i, j in enumerate(plcp):
+        while s[i+h] == s[j+h]:
+            h += 1
+        plcp[i] = h
+        if h:
+            h -= 1
+    ret = phi[SA]
+    ret[0] = 0
+    return ret
+
+
+def suffix_array(seq: Iterable[_T], assume_marked=False, method: _Method = 'sais',
+                 return_lcp=False) -> Union[np.ndarray, tuple[np.ndarray, np.ndarray]]:
+    """Calculate the suffix array (indices that sort the suffixes of `seq`).
+
+    By default, uses the SA-IS algorithm of [NZC09]_ after remapping `seq` to a
+    dense integer alphabet (see `dense_ranks`). All buckets are preallocated in
+    one `BucketArray <scicomp.exam.kk.bwt.collections.BucketArray>` and filled
+    through its head and tail pointers. The reduced strings are sorted in a
+    loop rather than recursively, all in the same workspace, so that the stack
+    does not grow. At its peak, memory is about 2.5 words per element (up to
+    3 for large alphabets): the workspace, which becomes the suffix array,
+    the ``int32`` ranks, and the ``int32`` codes and S*-positions of the
+    level at hand, which a pure implementation of [NZC09]_ would keep within
+    the workspace for its 2 words per element.
+
+    Alternatively, ``method='doubling'`` uses prefix doubling in the style of
+    [LS07]_: :math:`O(n \\log n)` work in the worst case, but done in
+    :math:`O(\\log n)` vectorised NumPy passes (only as many as required to
+    tell all suffixes apart, so fewer for less repetitive sequences).
+
+    Args:
+        seq: the sequence. An end marker, smaller than all elements, is
+            implicitly appended to it, unless it already ends with one, or
+            `assume_marked` is set, in which case the last element is taken to
+            be the end marker.
+        assume_marked: see above.
+        method: ``'sais'`` or ``'doubling'``.
+        return_lcp: whether to also return the LCP array (see `lcp_array`),
+            computed from the integer-coded `seq` already at hand.
+
+    Returns:
+        The suffix array of `seq` together with the end marker (which is
+        thus always first), and optionally the LCP array.
+    """
+    with phase('suffix_array.ranks'):
+        s, sigma = dense_ranks(seq, assume_marked)
+    SA = _construct(s, sigma, method)
+    if not return_lcp:
+        return SA
+    with phase('suffix_array.lcp'):
+        return SA, _lcp(s, SA)
+
+
+def lcp_array(seq: Iterable[_T], sa: Sequence[int], assume_marked=False) -> np.ndarray:
+    """Calculate the longest-common-prefix (LCP) array of `seq` in linear time.
+
+    Args:
+        seq: the sequence, with the same conventions as in `suffix_array`.
+        sa: its suffix array as returned by `suffix_array`, i.e. including the
+            end marker.
+        assume_marked: see `suffix_array`.
+
+    Returns:
+        The lengths of the longest common prefixes of the suffixes
+        ``sa[i-1]`` and ``sa[i]`` (with ``0`` for ``i = 0``).
+
+    See Also:
+        ``suffix_array(..., return_lcp=True)``
+    """
+    s = dense_ranks(seq, assume_marked)[0]
+    sa = np.asarray(sa, dtype=np.int64)
+    if len(sa) != len(s):
+        raise ValueError(f'Expected a suffix array of length {len(s)}, not {len(sa)}.')
+    return _lcp(s, sa)
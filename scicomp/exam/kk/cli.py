@@ -0,0 +1,334 @@
+"""The ``kk`` command: compress, decompress, search and index files.
+
+Installed as a console script, and also runnable as ``python -m
+scicomp.exam.kk.cli``::
+
+    kk compress -f bwt -b 900k -j 4 data.txt -o data.kkb
+    kk decompress data.kkb | kk search -c 'needle'
+    kk index data.txt 'pattern' 'another' --locate
+
+Every command reads a file, which is memory-mapped, or, without one (or with
+``-``), streams its standard input a block at a time, and writes to its
+standard output unless given ``-o``. The format of a compressed input is
+recognised by its magic bytes. When done, a line with the amount of data
+processed and the throughput is reported on standard error (unless ``-q``).
+
+``kk compress -f bwt`` writes the container of `bwt_encode_file`, except
+that its magic is ``b'KKBWT\\x02'`` and each transformed block is further
+compressed with move-to-front, run length and Huffman coding (see
+`pipeline`), like bzip2, since the transform alone does not make anything
+smaller. The blocks are compressed in parallel, on ``-j`` workers, whereas
+``-f lzw`` writes a single LZW stream, which cannot be split, so it ignores
+``-j``.
+
+The exit status is 0 on success, 1 if ``kk search`` found nothing and 2 on
+errors.
+"""
+
+import argparse
+import io
+import os
+import re
+import struct
+import sys
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import islice
+from time import perf_counter
+from typing import BinaryIO, Iterator, Optional, Sequence
+
+import numpy as np
+
+from . import __version__
+from ._files import _mapped
+from ._parallel import _starmap
+from .bwt import blocks as _bwt
+from .bwt.fm_index import FMIndex
+from .bwt.primary import decode_primary, encode_primary
+from .bwt.suffix_array import _Method
+from .kmp import _CHUNK_SIZE, _non_overlapping, _search_stream, kmp_search_file
+from .lzw import container as _lzw
+from .lzw.coders import LZWEncoder
+from .profiling import profile
+from .stages import pipeline
+
+
+__all__ = 'main',
+
+
+_STDIO = '-'
+
+_BWT_MAGIC = b'KKBWT\x02'
+_BWT_STAGES = 'mtf', 'rle', 'huffman'
+
+_UNITS = {'': 1, 'k': 10**3, 'm': 10**6, 'g': 10**9, 'ki': 2**10, 'mi': 2**20, 'gi': 2**30}
+
+
+def _size(arg: str) -> int:
+    """Parse a size like ``65536``, ``900k``, ``16Mi`` or ``1G``."""
+    match = re.fullmatch(r'(\d+)([kmg]i?)?b?', arg.strip().lower())
+    if not match or not int(match[1]):
+        raise argparse.ArgumentTypeError(f'invalid size: {arg!r}')
+    return int(match[1]) * _UNITS[match[2] or '']
+
+
+def _human(n: float) -> str:
+    """A (decimal) human-readable number of bytes."""
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if abs(n) < 1000 or unit == 'GB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.3g} {unit}'
+        n /= 1000
+
+
+class _Stream:
+    """A binary input read sequentially, which counts the bytes read and can
+    peek ahead (e.g. at a magic number)."""
+    __slots__ = 'file', 'head', 'count'
+
+    def __init__(self, file: BinaryIO):
+        self.file, self.head, self.count = file, b'', 0
+
+    def peek(self, n: int) -> bytes:
+        if len(self.head) < n:
+            self.head += self.file.read(n - len(self.head))
+        return self.head[:n]
+
+    def read(self, n: int) -> bytes:
+        ret, self.head = self.head[:n], self.head[n:]
+        if len(ret) < n:
+            ret += self.file.read(n - len(ret))
+        self.count += len(ret)
+        return ret
+
+    def chunks(self, size: int) -> Iterator[bytes]:
+        return iter(partial(self.read, size), b'')
+
+
+@contextmanager
+def _source(path: str) -> Iterator[_Stream]:
+    """The standard input, or the file at `path`, memory-mapped."""
+    if path == _STDIO:
+        yield _Stream(sys.stdin.buffer)
+        return
+    with _mapped(path) as buf:
+        yield _Stream(buf or io.BytesIO())
+
+
+@contextmanager
+def _sink(path: str, binary: bool = False) -> Iterator[BinaryIO]:
+    """The standard output, or the file at `path`. With `binary`, refuse to
+    write to a terminal."""
+    if path != _STDIO:
+        with open(path, 'wb') as out:
+            yield out
+        return
+    out = sys.stdout.buffer
+    if binary and out.isatty():
+        raise ValueError('refusing to write compressed data to a terminal (use -o)')
+    yield out
+    out.flush()
+
+
+def _bwt_encode_block(block: bytes, method: _Method) -> tuple[bytes, int]:
+    """The BWT of `block`, compressed by `_BWT_STAGES`, and its primary index."""
+    data, primary = encode_primary(block, method)
+    return next(pipeline(_BWT_STAGES, len(data)).encode(data)), primary
+
+
+def _bwt_decode_block(data: bytes, primary: int) -> bytes:
+    return decode_primary(next(pipeline(_BWT_STAGES).decode([data])), primary)
+
+
+def _compress(args) -> tuple[int, int, int]:
+    with _source(args.input) as src, _sink(args.output, binary=True) as out:
+        if args.format == 'bwt':
+            size = args.block_size or _bwt._BLOCK_SIZE
+            blocks = _starmap(partial(_bwt_encode_block, method=args.method),
+                              zip(src.chunks(size)), workers=args.workers)
+            written = _bwt._dump(blocks, out, size, _BWT_MAGIC)
+        else:
+            if args.workers not in (None, 1):
+                print('kk compress: ignoring -j, LZW is a single stream', file=sys.stderr)
+            written = _lzw._dump(src.chunks(args.block_size or _lzw._CHUNK_SIZE), out,
+                                 LZWEncoder(range(256), args.max_codes, args.policy))
+    return 0, src.count, written
+
+
+def _decompress(args) -> tuple[int, int, int]:
+    with _source(args.input) as src, _sink(args.output) as out:
+        magic = src.peek(len(_lzw.MAGIC))
+        try:
+            if magic == _lzw.MAGIC:
+                written = _lzw._load(src.read, out)
+            elif magic == _BWT_MAGIC:
+                blocks = _starmap(_bwt_decode_block, _bwt._frames(src.read, _BWT_MAGIC), args.workers)
+                written = sum(map(out.write, blocks))
+            elif magic == _bwt.MAGIC:  # as written by bwt_encode_file
+                written = sum(map(out.write, _bwt.bwt_decode_blocks(_bwt._frames(src.read), args.workers)))
+            else:
+                raise ValueError('not a kk (LZW or BWT) container')
+        except struct.error:
+            raise ValueError('truncated container') from None
+    return 0, src.count, written
+
+
+def _search(args) -> tuple[int, int, None]:
+    needle = os.fsencode(args.needle)
+    if not needle:
+        raise ValueError('the needle is empty')
+    chunk_size = args.block_size or _CHUNK_SIZE
+    if args.input == _STDIO:
+        src = _Stream(sys.stdin.buffer)
+        matches = _search_stream(needle, src.chunks(chunk_size))
+        if not args.overlapping:
+            matches = _non_overlapping(matches, len(needle))
+        if args.first:
+            matches = islice(matches, 1)
+    elif args.first:
+        first = kmp_search_file(args.input, needle, args.workers, chunk_size=chunk_size)
+        matches = [] if first is None else [first]
+    else:
+        matches = kmp_search_file(args.input, needle, args.workers, find_all=True,
+                                  overlapping=args.overlapping, chunk_size=chunk_size)
+
+    found = last = 0
+    for last in matches:
+        found += 1
+        if not args.count:
+            sys.stdout.write(f'{last}\n')
+    if args.count:
+        sys.stdout.write(f'{found}\n')
+    sys.stdout.flush()
+
+    if args.input == _STDIO:
+        nin = src.count
+    else:  # the first occurrence is (at best) all that was searched for
+        nin = last + len(needle) if args.first and found else os.path.getsize(args.input)
+    return int(not found), nin, None
+
+
+def _index(args) -> tuple[int, int, None]:
+    if not args.patterns and args.input == _STDIO:
+        raise ValueError('give the patterns as arguments when indexing the standard input')
+    if args.input == _STDIO:
+        index = FMIndex(np.frombuffer(sys.stdin.buffer.read(), dtype=np.uint8), method=args.method)
+    else:
+        with _mapped(args.input) as buf:
+            # the array must be gone before the file is unmapped
+            data = np.frombuffer(buf, dtype=np.uint8) if buf else np.zeros(0, dtype=np.uint8)
+            index = FMIndex(data, method=args.method)
+            del data
+
+    patterns = map(os.fsencode, args.patterns) if args.patterns else (
+        line.rstrip(b'\r\n') for line in sys.stdin.buffer)
+    for pattern in patterns:
+        result = (' '.join(map(str, np.sort(index.locate(pattern)).tolist())) if args.locate
+                  else index.count(pattern))
+        sys.stdout.write(f'{os.fsdecode(pattern)}\t{result}\n')
+    sys.stdout.flush()
+    return 0, len(index), None
+
+
+def _report(command: str, nin: int, nout: Optional[int], seconds: float) -> str:
+    ret = f'kk {command}: {_human(nin)}'
+    if nout is not None:
+        ret += f' -> {_human(nout)}' + (f' ({nout / nin:.1%})' if nin else '')
+    return ret + f' in {seconds:.3g} s ({_human(nin / max(seconds, 1e-9))}/s)'
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='kk', description='Compress, decompress, search and index files (or streams).')
+    parser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-q', '--quiet', action='store_true', help='do not report the throughput')
+    common.add_argument('--profile', action='store_true',
+                        help='report the time spent in each phase (in this process)')
+    files = argparse.ArgumentParser(add_help=False)
+    files.add_argument('input', nargs='?', default=_STDIO, help='file to read (default: stdin)')
+    files.add_argument('-o', '--output', default=_STDIO, help='file to write (default: stdout)')
+    workers = argparse.ArgumentParser(add_help=False)
+    workers.add_argument('-j', '--workers', type=int,
+                         help='worker processes (default: one per CPU)')
+
+    cmd = commands.add_parser(
+        'compress', parents=[files, workers, common], help='compress with LZW or a block-wise BWT',
+        description='Compress with LZW or with a block-wise BWT followed by MTF, RLE and Huffman '
+                    'coding, like bzip2. The BWT blocks are compressed in parallel, on -j '
+                    'workers; LZW is a single stream, so it ignores -j.')
+    cmd.add_argument('-f', '--format', choices=('lzw', 'bwt'), default='lzw',
+                     help='the container format (default: %(default)s)')
+    cmd.add_argument('-b', '--block-size', type=_size,
+                     help=f'bytes per block, e.g. 900k (default: {_bwt._BLOCK_SIZE} for bwt, '
+                          f'and {_lzw._CHUNK_SIZE} per LZW chunk)')
+    cmd.add_argument('--method', choices=('sais', 'doubling'), default='sais',
+                     help='suffix array construction for bwt (default: %(default)s)')
+    cmd.add_argument('--max-codes', type=int, help='bound on the LZW bag (default: none)')
+    cmd.add_argument('--policy', choices=LZWEncoder.policies, default='freeze',
+                     help='what to do when the LZW bag is full (default: %(default)s)')
+    cmd.set_defaults(func=_compress, parser=cmd)
+
+    cmd = commands.add_parser(
+        'decompress', parents=[files, workers, common], help='decompress the output of compress',
+        description='Decompress the output of compress (whose format is detected).')
+    cmd.set_defaults(func=_decompress, parser=cmd)
+
+    cmd = commands.add_parser(
+        'search', parents=[workers, common], help='print the offsets of a needle',
+        description='Print the byte offsets of the occurrences of NEEDLE, one per line. '
+                    'A file is searched in chunks on -j workers.')
+    cmd.add_argument('needle')
+    cmd.add_argument('input', nargs='?', default=_STDIO, help='file to search (default: stdin)')
+    cmd.add_argument('--first', action='store_true', help='stop at the first occurrence')
+    cmd.add_argument('-c', '--count', action='store_true', help='print only the number of occurrences')
+    cmd.add_argument('--no-overlap', dest='overlapping', action='store_false',
+                     help='skip occurrences that overlap the previous one')
+    cmd.add_argument('-b', '--block-size', type=_size,
+                     help=f'bytes per chunk (default: {_CHUNK_SIZE})')
+    cmd.set_defaults(func=_search, parser=cmd)
+
+    cmd = commands.add_parser(
+        'index', parents=[common], help='count or locate patterns with an FM-index',
+        description='Build an FM-index of INPUT and print, for each pattern (from the arguments, '
+                    'or else one per line of stdin), a tab and its count or offsets.')
+    cmd.add_argument('input', help='file to index (- for stdin)')
+    cmd.add_argument('patterns', nargs='*', metavar='pattern')
+    cmd.add_argument('-l', '--locate', action='store_true',
+                     help='print the (sorted) offsets instead of the counts')
+    cmd.add_argument('--method', choices=('sais', 'doubling'), default='sais',
+                     help='suffix array construction (default: %(default)s)')
+    cmd.set_defaults(func=_index, parser=cmd)
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = _parser().parse_known_args(argv)[0]
+    # again, for the command alone, since argparse cannot intermix its
+    # positionals (e.g. NEEDLE and INPUT) with options under a subcommand
+    args = args.parser.parse_intermixed_args(argv[argv.index(args.command) + 1:],
+                                            argparse.Namespace(command=args.command))
+    start = perf_counter()
+    try:
+        with profile() if args.profile else nullcontext() as stats:
+            status, nin, nout = args.func(args)
+    except BrokenPipeError:
+        # the reader went away (e.g. ``kk decompress ... | head``): stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        print(f'kk {args.command}: {e}', file=sys.stderr)
+        return 2
+
+    if not args.quiet:
+        print(_report(args.command, nin, nout, perf_counter() - start), file=sys.stderr)
+    if stats is not None:
+        print(stats, file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
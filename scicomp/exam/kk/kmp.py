@@ -1,17 +1,121 @@
-from typing import Iterable, Optional, Sequence, TypeVar
+import os
+from array import array
+from functools import cached_property, partial
+from itertools import chain, islice
+from typing import Generator, Generic, Iterable, Iterator, Optional, Sequence, TypeVar, Union
 
+import numpy as np
 
-__all__ = 'kmp_search',
+from ._files import _mapped, _PathLike
+from ._parallel import _imap, _Pool, _starmap, _TASK_INPUTS
+from .profiling import current, phase
+
+
+__all__ = 'kmp_search', 'KMPMatcher', 'kmp_search_file', 'kmp_search_many'
 
 
 _T = TypeVar('_T')
 
 
-def _kmp_table(needle: Sequence[_T]) -> Sequence[int]:
-    """Compute the KMP partial match "table"."""
-    return [j for j in [-1]
-            for cur in needle  # linear scan of the needle
-            for j in [j+1 if cur == needle[j] else 0]]
+def _kmp_table(needle: Sequence[_T]) -> list[int]:
+    """Compute the KMP partial match table (the *prefix function*).
+
+    ``table[i]`` is the length of the longest proper prefix of
+    ``needle[:i+1]`` that is also its suffix. Each step follows the chain of
+    such borders down from the previous one, and since a border grows by at
+    most one per step, this takes :math:`O(m)` comparisons in total.
+    """
+    ret, k = len(needle) * [0], 0
+    for i in range(1, len(needle)):
+        while k and needle[i] != needle[k]:
+            k = ret[k-1]
+        if needle[i] == needle[k]:
+            k += 1
+        ret[i] = k
+    return ret
+
+
+def _kmp_strong_table(needle: Sequence[_T]) -> list[int]:
+    """Compute Knuth's optimised ("strong") failure table.
+
+    After a mismatch at ``needle[j]``, the search can continue at the longest
+    border ``k`` of ``needle[:j]`` with ``needle[k] != needle[j]``: any other
+    one would be compared to the same element and fail again. That is
+    ``table[j]``, or ``-1`` if there is none (and the element is skipped).
+    ``table[m]`` is the longest border of the whole needle, where to continue
+    after a match.
+    """
+    m = len(needle)
+    ret, k = (m + 1) * [-1], -1
+    for i in range(m):
+        while k >= 0 and needle[i] != needle[k]:
+            k = ret[k]
+        k += 1
+        ret[i+1] = ret[k] if i + 1 < m and needle[i+1] == needle[k] else k
+    return ret
+
+
+def _kmp_scan(needle: Sequence[_T], table: Sequence[int], haystack: Iterable[_T],
+              state: int, pos: int, overlapping: bool
+              ) -> Generator[int, None, tuple[int, int]]:
+    """Yield the matches using the strong failure `table` (see
+    `_kmp_strong_table`), and return the final state and position."""
+    m = len(needle)
+    if not m:  # matches everywhere; the state tells if 0 was reported
+        if not state:
+            yield 0
+        for pos, _ in enumerate(haystack, pos + 1):
+            yield pos
+        return 1, pos
+
+    j, i = state, pos - 1
+    for i, cur in enumerate(haystack, pos):
+        while j >= 0 and needle[j] != cur:
+            j = table[j]
+        j += 1
+        if j == m:
+            yield i - m + 1
+            j = table[m] if overlapping else 0
+    return j, i + 1
+
+
+_BUFFERS = (str, bytes, bytearray, memoryview, np.ndarray)
+
+_MIN_ARRAY = 256  # shorter haystacks are not worth the NumPy overhead
+_WINDOW = 2**16  # how much of the haystack to filter at a time
+_BUDGET = 16  # filtering work per element of a window before giving up on it
+_MAX_DFA = 2**22
+
+
+def _as_buffer(seq) -> Optional[np.ndarray]:
+    """View `str`, `bytes`-like objects and integer NumPy arrays as 1-D integer
+    arrays, or return `None` for anything else."""
+    if isinstance(seq, str):  # code points, one byte each if possible
+        return (np.frombuffer(seq.encode('ascii'), dtype=np.uint8) if seq.isascii()
+                else np.frombuffer(seq.encode('utf-32-le'), dtype='<u4'))
+    if isinstance(seq, (bytes, bytearray, memoryview)):
+        seq = np.asarray(memoryview(seq))
+    if isinstance(seq, np.ndarray) and seq.ndim == 1 and np.issubdtype(seq.dtype, np.integer):
+        return seq
+    return None
+
+
+def _dfa(codes: Sequence[int], table: Sequence[int], sigma: int) -> array:
+    """The KMP automaton of the needle `codes` (in ``range(sigma)``) as a flat
+    transition table.
+
+    States are premultiplied by the row length ``sigma + 1``, so that the next
+    state is ``dfa[state + code]``, and the extra code ``sigma`` stands for
+    any element not in the needle.
+    """
+    m = len(codes)
+    dfa = np.zeros((m + 1, sigma + 1), dtype=np.int32)
+    dfa[0, codes[0]] = 1
+    for j in range(1, m + 1):
+        dfa[j] = dfa[table[j-1]]  # mismatches go where the border would
+        if j < m:
+            dfa[j, codes[j]] = j + 1
+    return array('i', (dfa * (sigma + 1)).ravel().tolist())
 
 
 def kmp_search(needle: Sequence[_T], haystack: Iterable[_T]) -> Optional[int]:
@@ -38,22 +142,321 @@ def kmp_search(needle: Sequence[_T], haystack: Iterable[_T]) -> Optional[int]:
         Since random access into the `needle` is needed, it is required to be a
         sequence. The `haystack` on the other hand can be any iterable.
 
-        Comparison is performed using `== <object.__eq__>`, so the usual
+        Comparison is performed using `!= <object.__ne__>`, so the usual
         equality rules apply.
+
+        The search is done by a `KMPMatcher`, and so `str`, `bytes`-like and
+        integer NumPy array haystacks are searched in bulk.
+    """
+    return KMPMatcher(needle).find(haystack)
+
+
+def _non_overlapping(matches: Iterable[int], m: int) -> Iterator[int]:
+    """Skip the `matches` that start before the previous one ends."""
+    end = 0
+    for i in matches:
+        if i >= end:
+            yield i
+            end = i + m
+
+
+class KMPMatcher(Generic[_T]):
+    """A KMP automaton for `needle`, built once and reusable.
+
+    Besides searching whole haystacks, it can be `fed <feed>` a haystack
+    chunk by chunk, carrying the state of the automaton (how much of the
+    needle has been matched) over the chunk boundaries.
+
+    Args:
+        needle: subsequence to search for.
+
+    Examples:
+        >>> matcher = KMPMatcher('abab')
+        >>> list(matcher.finditer('abababab')), matcher.count('abababab', overlapping=False)
+        ([0, 2, 4], 2)
+        >>> matcher.feed('xxab'), matcher.feed('abab')
+        ([], [2, 4])
+    """
+
+    def __init__(self, needle: Sequence[_T]):
+        self.needle = needle
+        self.reset()
+
+    @cached_property
+    def table(self) -> list[int]:
+        """The partial match table (see `_kmp_table`), built when first needed."""
+        with phase('kmp.table'):
+            return _kmp_table(self.needle)
+
+    @cached_property
+    def strong_table(self) -> list[int]:
+        """The strong failure table (see `_kmp_strong_table`), which the scan
+        follows on mismatches, built when first needed."""
+        with phase('kmp.table'):
+            return _kmp_strong_table(self.needle)
+
+    @cached_property
+    def _array(self) -> Optional[np.ndarray]:
+        """The needle as an integer array (see `_as_buffer`), if it can be."""
+        if isinstance(self.needle, _BUFFERS):
+            return _as_buffer(self.needle)
+        try:
+            if all(isinstance(cur, (int, np.integer)) for cur in self.needle):
+                return np.array(self.needle, dtype=np.int64)
+        except OverflowError:
+            pass
+        return None
+
+    @cached_property
+    def _automaton(self) -> tuple[np.ndarray, list[int], Optional[array]]:
+        """The alphabet of the needle, its codes in it, and the transition table
+        of the KMP automaton over them (if not too big)."""
+        table = self.table
+        with phase('kmp.table'):
+            alphabet, codes = np.unique(self._array, return_inverse=True)
+            codes = codes.ravel().tolist()
+            if (len(codes) + 1) * (len(alphabet) + 1) > _MAX_DFA:
+                return alphabet, codes, None
+            return alphabet, codes, _dfa(codes, table, len(alphabet))
+
+    def reset(self):
+        """Forget everything that was `fed <feed>`."""
+        self.state, self.pos = 0, 0
+
+    def _scan(self, haystack: Iterable[_T], state: int, pos: int, overlapping: bool
+              ) -> Generator[int, None, tuple[int, int]]:
+        return _kmp_scan(self.needle, self.strong_table, haystack, state, pos, overlapping)
+
+    def _array_matches(self, haystack: np.ndarray) -> Iterator[int]:
+        """All (overlapping) occurrences in an array, window by window.
+
+        The positions of the first element of the needle are candidates, which
+        are then narrowed down by comparing the rest of the elements, last one
+        first, with a few vectorised operations each. If that does not whittle
+        them down quickly enough (e.g. in a periodic haystack), the window is
+        scanned with the KMP automaton instead, so the work is linear either
+        way.
+        """
+        needle, n, m = self._array, len(haystack), len(self._array)
+        stats = current()
+        if not m:
+            yield from range(n + 1)
+            return
+        if np.issubdtype(haystack.dtype, np.unsignedinteger) and needle.min() < 0:
+            return
+        if not np.array_equal(needle.astype(haystack.dtype), needle):
+            return  # out of range, so cannot occur
+        needle = needle.astype(haystack.dtype)
+
+        size = max(_WINDOW, m)
+        for lo in range(0, n - m + 1, size):
+            hi = min(lo + size, n - m + 1)
+            cand = np.flatnonzero(haystack[lo:hi] == needle[0])
+            cand += lo
+            work = 0
+            for k in chain((m - 1,), range(1, m - 1)):
+                if not len(cand) or (work := work + len(cand)) > _BUDGET * size:
+                    break
+                cand = cand[haystack[cand + k] == needle[k]]
+            if stats:
+                stats.count('kmp.windows')
+                stats.count('kmp.filtering', work)
+            if work > _BUDGET * size:
+                if stats:
+                    stats.count('kmp.automaton_windows')
+                yield from self._dfa_matches(haystack[lo:hi+m-1], lo)
+            else:
+                yield from cand.tolist()
+
+    def _dfa_matches(self, haystack: np.ndarray, pos: int) -> Iterator[int]:
+        """All occurrences in `haystack` (a window starting at `pos`) by running
+        the KMP automaton over the codes of its elements in the alphabet of
+        the needle."""
+        alphabet, needle, dfa = self._automaton
+        sigma, m = len(alphabet), len(needle)
+        idx = np.searchsorted(alphabet, haystack)
+        idx[idx == sigma] = 0
+        codes = np.where(alphabet[idx] == haystack, idx, sigma).tolist()
+
+        if dfa is None:  # too big, follow the failures instead
+            yield from _kmp_scan(needle, self.strong_table, codes, 0, pos, True)
+            return
+        final, j = m * (sigma + 1), 0
+        for i, c in enumerate(codes, pos - m + 1):
+            j = dfa[j + c]
+            if j == final:
+                yield i
+
+    def finditer(self, haystack: Iterable[_T], overlapping=True) -> Iterator[int]:
+        """Find all occurrences of the needle in `haystack`.
+
+        Args:
+            haystack: sequence to search in. Any iterable will do, since it is
+                consumed strictly left to right.
+            overlapping: whether to also report occurrences that overlap with
+                previous ones, or else, like `str.count`, to continue after
+                the end of each one.
+
+        Returns:
+            An iterator over the positions of the occurrences. Like with
+            `str.find`, an empty needle occurs at every position, including
+            ``len(haystack)``.
+
+        Notes:
+            If both the needle and `haystack` are `str`, or else `bytes`-like
+            objects (including `memoryview`) or integer NumPy arrays, the
+            candidate positions are filtered with NumPy, a window at a time,
+            which is much faster than stepping through the elements.
+        """
+        array = None
+        if (isinstance(haystack, _BUFFERS) and len(haystack) >= _MIN_ARRAY
+                and isinstance(haystack, str) == isinstance(self.needle, str)):
+            array = _as_buffer(haystack)
+        if array is None or self._array is None:
+            return self._scan(haystack, 0, 0, overlapping)
+        matches = self._array_matches(array)
+        return matches if overlapping else _non_overlapping(matches, len(self.needle))
+
+    def find(self, haystack: Iterable[_T]) -> Optional[int]:
+        """The position of the first occurrence of the needle in `haystack`
+        or `None`. See `kmp_search`."""
+        with phase('kmp.scan'):
+            return next(self.finditer(haystack), None)
+
+    def count(self, haystack: Iterable[_T], overlapping=True) -> int:
+        """The number of occurrences of the needle in `haystack`. See
+        `finditer`."""
+        with phase('kmp.scan'):
+            return sum(1 for _ in self.finditer(haystack, overlapping))
+
+    def feed(self, chunk: Iterable[_T], overlapping=True) -> list[int]:
+        """Continue searching in the next `chunk` of a haystack.
+
+        Returns:
+            The positions (from the start of the whole haystack) of the
+            occurrences that end in `chunk`. See `finditer`.
+        """
+        ret, scan = [], self._scan(chunk, self.state, self.pos, overlapping)
+        with phase('kmp.scan'):
+            while True:
+                try:
+                    ret.append(next(scan))
+                except StopIteration as e:
+                    self.state, self.pos = e.value
+                    return ret
+
+
+_CHUNK_SIZE = 2**24
+
+
+def _search_chunk(path: _PathLike, needle: bytes, start: int, stop: int, find_all: bool
+                  ) -> np.ndarray:
+    """The (first) occurrences of `needle` that start in ``start:stop`` of the
+    file at `path`."""
+    with _mapped(path) as buf:
+        # the array must be gone before the file is unmapped, hence the list
+        data = np.frombuffer(buf, dtype=np.uint8, offset=start,
+                             count=min(len(buf), stop + len(needle) - 1) - start)
+        matches = KMPMatcher(needle).finditer(data)
+        ret = list(matches if find_all else islice(matches, 1))
+        del data, matches
+    return np.array(ret, dtype=np.int64) + start
+
+
+def _search_file(path: _PathLike, needle: bytes, size: int, workers: Optional[int],
+                 find_all: bool, chunk_size: int) -> Iterator[int]:
+    """All (overlapping) occurrences, or just the first one, chunk by chunk."""
+    for ret in _starmap(_search_chunk, (
+        (path, needle, i, min(i + chunk_size, size), find_all)
+        for i in range(0, size - len(needle) + 1, chunk_size)
+    ), workers=workers):
+        yield from ret.tolist()
+        if len(ret) and not find_all:
+            return
+
+
+def kmp_search_file(path: _PathLike, needle: bytes, workers: Optional[int] = None,
+                    find_all=False, overlapping=True, chunk_size: int = _CHUNK_SIZE
+                    ) -> Union[Optional[int], Iterator[int]]:
+    """Find `needle` in the file at `path`, in parallel.
+
+    The file is split into chunks of `chunk_size` bytes, which are searched
+    (with a `KMPMatcher`) in a `~concurrent.futures.ProcessPoolExecutor`, each
+    worker memory-mapping the file itself. A chunk is responsible for the
+    occurrences that *start* in it, so it is read on for ``len(needle) - 1``
+    bytes into the next one, and occurrences across the boundaries are found
+    exactly once.
+
+    Args:
+        path: path to the file.
+        needle: the bytes to search for.
+        workers: the number of worker processes (`None` for the number of
+            CPUs). With ``workers=1`` the chunks are searched in this process.
+        find_all: whether to find all occurrences, or just the first one.
+        overlapping: with `find_all`, see `KMPMatcher.finditer`.
+        chunk_size: how many bytes to give a worker at a time.
+
+    Returns:
+        The offset of the first occurrence of `needle` in the file or `None`
+        (like `kmp_search`), or with `find_all`, an iterator over all of them,
+        in order.
+
+    Warnings:
+        With `find_all`, returns an iterator, which keeps the process pool
+        alive until it is exhausted.
     """
-    return next((
-        i-j+1
+    size = os.path.getsize(path)
+    if not len(needle):
+        return iter(range(size + 1)) if find_all else 0
+    matches = _search_file(path, needle, size, workers, find_all, chunk_size)
+    if find_all:
+        return matches if overlapping else _non_overlapping(matches, len(needle))
+    return next(matches, None)
 
-        for tbl, j in [(_kmp_table(needle), 0)]  # initialise
 
-        # indeed, cycle only once through haystack!:
-        for i, cur in enumerate(haystack)
+def _search_stream(needle: bytes, chunks: Iterable[bytes]) -> Iterator[int]:
+    """All (overlapping) occurrences of a non-empty `needle` in a stream of
+    `chunks`, each searched along with the last ``len(needle) - 1`` bytes
+    before it, so that the NumPy path of `KMPMatcher.finditer` applies, and
+    occurrences across the boundaries are found exactly once."""
+    matcher, keep = KMPMatcher(needle), len(needle) - 1
+    tail, pos = b'', 0  # the bytes kept, and where they start
+    for chunk in chunks:
+        data = tail + chunk
+        yield from (pos + i for i in matcher.finditer(data))
+        cut = max(len(data) - keep, 0)
+        tail, pos = data[cut:], pos + cut
 
-        # checks here allow the table building to be slightly simpler
-        # and to allow a non-sequence iterable haystack
-        for j in [(j if needle[j] == cur else tbl[j-1] if j > 0 else -1) + 1]
 
-        # if starting all over, check current against the first:
-        for j in [j if j > 1 else int(cur == needle[0])]
-        if j == len(needle)  # breaking condition
-    ), None) if len(needle) else 0
+def _search(matcher: KMPMatcher[_T], haystack: Iterable[_T], find_all: bool, overlapping: bool
+            ) -> Union[Optional[int], list[int]]:
+    return list(matcher.finditer(haystack, overlapping)) if find_all else matcher.find(haystack)
+
+
+def kmp_search_many(needle: Sequence[_T], haystacks: Iterable[Iterable[_T]], find_all=False,
+                    overlapping=True, workers: Optional[int] = None, pool: _Pool = 'process',
+                    chunksize: int = _TASK_INPUTS, ordered=True
+                    ) -> Iterator[Union[Optional[int], list[int], tuple[int, Union[Optional[int], list[int]]]]]:
+    """Find `needle` in many haystacks in a pool of workers.
+
+    The needle is sent along with every task (a chunk of haystacks), whose
+    worker builds its `KMPMatcher` tables once for the whole chunk.
+
+    Args:
+        needle: subsequence to search for.
+        haystacks: the sequences to search in.
+        find_all: whether to find all occurrences, or just the first one.
+        overlapping: with `find_all`, see `KMPMatcher.finditer`.
+        workers, pool, chunksize, ordered: see `bwt_encode_many`.
+
+    Returns:
+        For each haystack, the position of the first occurrence of `needle`
+        or `None` (like `kmp_search`), or with `find_all`, a `list` of all of
+        them, or with ``ordered=False``, tuples of the index of the haystack
+        and that.
+
+    Warnings:
+        Returns an iterator, which keeps the pool alive until it is exhausted.
+    """
+    return _imap(partial(_search, KMPMatcher(needle), find_all=find_all, overlapping=overlapping),
+                 haystacks, workers, pool, chunksize, ordered)
@@ -0,0 +1,148 @@
+from array import array
+from functools import partial
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Sequence, TypeVar, Union
+
+import numpy as np
+from more_itertools import chunked
+
+from .._parallel import _imap, _Pool, _TASK_INPUTS
+from .coders import _ARRAY_DTYPES, _LZWCoder, _Policy, LZWDecoder, LZWEncoder
+from .container import lzw_compress_file, lzw_decompress_file
+
+
+__all__ = ('LZWEncoder', 'LZWDecoder', 'lzw_encode', 'lzw_decode', 'lzw_encode_many',
+           'lzw_compress_file', 'lzw_decompress_file')
+
+
+_T = TypeVar('_T')
+
+_CHUNK_SIZE = 2**16
+
+
+def _updates(coder: _LZWCoder, chunks: Iterable[Iterable]) -> Iterable[Sequence]:
+    yield from map(coder.update, chunks)
+    yield coder.flush()
+
+
+def _stream(coder: _LZWCoder, chunks: Iterable[Iterable]) -> Iterable:
+    return chain.from_iterable(_updates(coder, chunks))
+
+
+def lzw_encode(seq: Iterable[_T], alphabet: Iterable[_T],
+               max_codes: Optional[int] = None, policy: _Policy = 'freeze'
+               ) -> Union[Iterable[int], np.ndarray]:
+    """Encode a sequence using the `Lempel–Ziv–Welch algorithm
+    <https://en.wikipedia.org/wiki/Lempel%E2%80%93Ziv%E2%80%93Welch>`_.
+
+    Args:
+        seq: the sequence to encode. Since it is consumed strictly left to
+            right, any iterable will do.
+        alphabet: a collection of possible unique elements in `seq`. If you
+            don't know the alphabet, go back to  first grade, or get it via
+            ``set(seq)``.
+        max_codes: bound on the size of the bag. See `LZWEncoder`.
+        policy: what to do when the bag is full. See `LZWEncoder`.
+
+    Returns:
+
+        The LZW encoding of `seq` as an iterable of indices into an ordered
+        "bag" that starts off with just the alphabet and is dynamically built.
+        For `bytes`, `bytearray` and ``uint8``/``uint16`` NumPy array inputs,
+        whose elements are translated to alphabet indices in bulk, this is a
+        NumPy array.
+
+    Warnings:
+        In the general case, returns an iterator, so make sure to "consume" it
+        before e.g. saving, or if you plan to re-use the result.
+
+    See Also:
+        `lzw_decode`, `LZWEncoder`
+    """
+    encoder = LZWEncoder(alphabet, max_codes, policy)
+    if isinstance(seq, (bytes, bytearray)):
+        seq = np.frombuffer(seq, dtype=np.uint8)
+    if isinstance(seq, np.ndarray) and seq.dtype in _ARRAY_DTYPES:
+        codes = array('q')  # unboxed, and viewed by the result without a copy
+        for i in range(0, len(seq), _CHUNK_SIZE):
+            encoder._update(seq[i:i+_CHUNK_SIZE], codes)
+        codes.extend(encoder.flush())
+        return np.frombuffer(codes, dtype=np.int64)
+    return _stream(encoder, chunked(seq, _CHUNK_SIZE))
+
+
+def lzw_decode(idx: Iterable[int], alphabet: Sequence[_T],
+               max_codes: Optional[int] = None, policy: _Policy = 'freeze'
+               ) -> Union[Iterable[_T], np.ndarray, str, bytes]:
+    """Decode a sequence previously encoded using `lzw_encode`.
+
+    Args:
+        idx: the output of `lzw_encode`, being an iterable of indices into a
+            bag of elements.
+        alphabet: the alphabet used to encode. This has to be the same as
+            the one passed to `lzw_encode`: no more, no fewer elements, in the
+            same order, otherwise gibberish will ensue!
+        max_codes: has to be the same as the one passed to `lzw_encode`.
+        policy: has to be the same as the one passed to `lzw_encode`.
+
+    Returns:
+
+        The decoded sequence. If the `alphabet` consists of characters, this
+        is a `str`, and if it is `bytes`, `bytes`. Otherwise, it is generally
+        not of the same object type as the original, so care should be taken
+        to do item-by-item comparison.
+
+        If `idx` is a NumPy array (e.g. from encoding an array or `bytes`), it
+        is decoded in bulk by `LZWDecoder.decode_array` (unless the policy is
+        ``'lru'``), and the result is a NumPy array (unless `str` or `bytes`
+        as above).
+
+    Warnings:
+        In the general case, returns an iterator, so make sure to "consume" it
+        before e.g. saving, or if you plan to re-use the result.
+
+    See Also:
+        `lzw_encode`, `LZWDecoder`
+    """
+    decoder = LZWDecoder(alphabet, max_codes, policy)
+    if isinstance(idx, np.ndarray) and decoder.policy != 'lru':
+        if decoder.join is bytes:
+            return decoder.decode_array(idx, dtype=np.uint8).tobytes()
+        ret = decoder.decode_array(idx)
+        return ret if decoder.join is list else decoder.join(ret.tolist())
+    if decoder.join is list:
+        return _stream(decoder, chunked(idx, _CHUNK_SIZE))
+    return decoder.join([]).join(_updates(decoder, chunked(idx, _CHUNK_SIZE)))
+
+
+def _encode(seq: Iterable[_T], alphabet: Sequence[_T], max_codes: Optional[int], policy: _Policy
+            ) -> Union[list[int], np.ndarray]:
+    """`lzw_encode`, but with the codes in a `list` rather than an iterator."""
+    ret = lzw_encode(seq, alphabet, max_codes, policy)
+    return ret if isinstance(ret, np.ndarray) else list(ret)
+
+
+def lzw_encode_many(seqs: Iterable[Iterable[_T]], alphabet: Iterable[_T],
+                    max_codes: Optional[int] = None, policy: _Policy = 'freeze',
+                    workers: Optional[int] = None, pool: _Pool = 'process',
+                    chunksize: int = _TASK_INPUTS, ordered=True
+                    ) -> Iterator[Union[list[int], np.ndarray, tuple[int, Union[list[int], np.ndarray]]]]:
+    """Encode many sequences with `lzw_encode` in a pool of workers.
+
+    Args:
+        seqs: the sequences to encode.
+        alphabet, max_codes, policy: see `lzw_encode`. The same for all `seqs`.
+        workers, pool, chunksize, ordered: see `bwt_encode_many`.
+
+    Returns:
+        The codes of each sequence: a NumPy array where `lzw_encode` would
+        give one, or else a `list`, or with ``ordered=False``, tuples of the
+        index of the sequence and its codes.
+
+    Warnings:
+        Returns an iterator, which keeps the pool alive until it is exhausted.
+    """
+    # the bag starts with the alphabet in its order here, even if it is a set
+    alphabet = list(alphabet)
+    return _imap(partial(_encode, alphabet=alphabet, max_codes=max_codes, policy=policy),
+                 seqs, workers, pool, chunksize, ordered)
@@ -0,0 +1,470 @@
+from collections import Counter, OrderedDict
+from math import inf
+from typing import (Callable, Generic, Iterable, Iterator, Literal, MutableSequence,
+                    Optional, Sequence, TypeVar, Union)
+
+import numpy as np
+
+from ..profiling import current, phase
+
+
+__all__ = 'LZWEncoder', 'LZWDecoder'
+
+
+_T = TypeVar('_T')
+
+_Policy = Literal['freeze', 'reset', 'lru']
+
+_ARRAY_DTYPES = np.dtype(np.uint8), np.dtype(np.uint16)
+
+_DENSE_ALPHABET = 64  # widest alphabet for which a dense table pays off
+_DENSE_ROWS = 2**12  # codes a dense table starts out with room for...
+_DENSE_ENTRIES = 2**24  # ...and the most (prefix, symbol) entries it may grow to
+
+
+class _LZWCoder(Generic[_T]):
+    """Bag bookkeeping that has to be mirrored exactly by encoder and decoder."""
+
+    policies = 'freeze', 'reset', 'lru'
+
+    def __init__(self, alphabet: Iterable[_T], max_codes: Optional[int] = None,
+                 policy: _Policy = 'freeze'):
+        if policy not in self.policies:
+            raise ValueError(f'policy should be one of {self.policies}, not {policy!r}.')
+
+        self.alphabet = list(alphabet)
+        self.max_codes = inf if max_codes is None else max_codes
+        self.policy = policy if max_codes is not None else 'freeze'
+
+        self.clear_code = len(self.alphabet) if self.policy == 'reset' else None
+        self.first_code = len(self.alphabet) + (self.clear_code is not None)
+        if self.max_codes <= self.first_code:
+            raise ValueError(f'max_codes should be larger than {self.first_code}.')
+
+        self.reset()
+
+    def reset(self):
+        self.next_code = self.first_code
+        if self.policy == 'lru':
+            # Phrases that are nobody's prefix, by time of last use, and the
+            # number of "children" of each phrase.
+            self.lru: OrderedDict[int, None] = OrderedDict()
+            self.children: Counter[int] = Counter()
+
+    def _touch(self, code: int):
+        if self.policy == 'lru' and code in self.lru:
+            self.lru.move_to_end(code)
+
+    def _new_code(self, prefix: int) -> Optional[int]:
+        """Assign a code for a new phrase starting with `prefix`.
+
+        Returns `None` if the phrase should not be added to the bag.
+        """
+        if self.next_code < self.max_codes:
+            self.next_code += 1
+            return self.next_code - 1
+        if self.policy == 'lru':
+            # prefix has just been used, so it's the last in lru if at all.
+            victim = next(iter(self.lru), prefix)
+            if victim != prefix:
+                self._evict(victim)
+                return victim
+        return None
+
+    def _evict(self, code: int):
+        """Remove `code` from the bag (`lru` policy only)."""
+        del self.lru[code]
+        prefix = self._prefix(code)
+        self.children[prefix] -= 1
+        if not self.children[prefix] and prefix >= self.first_code:
+            self.lru[prefix] = None
+
+    def _register(self, code: int, prefix: int):
+        """Update bookkeeping after `code` has been added (`lru` only)."""
+        self.lru[code] = None
+        self.lru.pop(prefix, None)
+        self.children[prefix] += 1
+
+    def _prefix(self, code: int) -> int:
+        raise NotImplementedError
+
+
+class LZWEncoder(_LZWCoder[_T]):
+    """Incremental LZW encoder, modelled on `zlib.compressobj`.
+
+    Feed it chunks of the sequence via `update` and collect the codes that
+    each chunk completes. Once the input is exhausted, `flush` returns the
+    code of the last pending match and resets the encoder for a new stream.
+    The only state kept between chunks is the current match and the bag, so
+    memory is bounded by the size of the latter, irrespective of the length
+    of the input. To bound the bag as well, use `max_codes`.
+
+    The bag is never actually stored as a list of phrases. Instead, each new
+    phrase is registered in a table under the key ``(prefix_code, symbol)``,
+    flattened into the single integer
+    ``prefix_code * len(alphabet) + alphabet.index(symbol)``, so that extending
+    the current match by one element is a single :math:`O(1)` lookup, and the
+    whole encoding is linear in the length of the input. As a consequence, the
+    elements need to be hashable. The table is a dense array of codes (with
+    ``0`` for phrases not in the bag) for small alphabets, which grows with
+    the bag as long as it does not get too large, and a hash table otherwise
+    (and with the ``'lru'`` policy, which removes phrases).
+
+    Chunks that are `bytes`, `bytearray` or ``uint8``/``uint16`` NumPy arrays
+    are translated into alphabet indices at once through a dense lookup table,
+    instead of element by element.
+
+    Args:
+        alphabet: a collection of possible unique elements in the sequence.
+        max_codes: the maximum number of codes (including the alphabet) in the
+            bag, or `None` to let it grow without bound. For example,
+            ``max_codes=2**12`` caps the codes to 12 bits.
+        policy: what to do once the bag is full:
+
+            - ``'freeze'``: stop adding phrases and keep using the existing
+              ones;
+            - ``'reset'``: emit a special "clear" code (which is reserved as
+              ``len(alphabet)``) and start over with a bag containing just the
+              alphabet, like ``compress(1)``;
+            - ``'lru'``: replace the least recently used phrase that is not a
+              prefix of any other phrase in the bag.
+
+            Ignored if `max_codes` is `None`.
+    """
+
+    def __init__(self, alphabet: Iterable[_T], max_codes: Optional[int] = None,
+                 policy: _Policy = 'freeze'):
+        super().__init__(alphabet, max_codes, policy)
+        # Single-element phrases: first occurrence wins, like list.index would.
+        self.roots = {a: i for i, a in reversed(tuple(enumerate(self.alphabet)))}
+        self.luts: dict[np.dtype, np.ndarray] = {}
+
+    def reset(self):
+        super().reset()
+        nalph = len(self.alphabet)
+        self.rows = min(self.max_codes, max(2 * self.first_code, _DENSE_ROWS))
+        if self.policy == 'lru' or nalph > _DENSE_ALPHABET or self.rows * nalph > _DENSE_ENTRIES:
+            self.table: Union[memoryview, dict[int, int]] = {}
+        else:  # zeroed lazily by the OS, so only the rows in use cost memory
+            self.table = memoryview(np.zeros(self.rows * len(self.alphabet), dtype=np.int32))
+        self.keys: dict[int, int] = {}  # only for lru
+        self.w = None  # code of the current (longest) match
+
+    def _grow(self):
+        """Make room in the (dense) table for twice as many codes or, if that
+        is too many entries, switch to a hash table."""
+        old = np.asarray(self.table)
+        self.rows = min(self.max_codes, 2 * self.rows)
+        if self.rows * len(self.alphabet) > _DENSE_ENTRIES:
+            keys = np.flatnonzero(old)
+            self.table = dict(zip(keys.tolist(), old[keys].tolist()))
+        else:
+            new = np.zeros(self.rows * len(self.alphabet), dtype=np.int32)
+            new[:len(old)] = old
+            self.table = memoryview(new)
+
+    def _prefix(self, code: int) -> int:
+        return self.keys[code] // len(self.alphabet)
+
+    def _evict(self, code: int):
+        super()._evict(code)
+        del self.table[self.keys.pop(code)]
+
+    def _lut(self, dtype: np.dtype) -> np.ndarray:
+        """Dense table from (small unsigned integer) elements to indices."""
+        if dtype not in self.luts:
+            self.luts[dtype] = lut = np.full(np.iinfo(dtype).max + 1, -1)
+            for a, i in self.roots.items():
+                if isinstance(a, (int, np.integer)) and 0 <= a < len(lut):
+                    lut[a] = i
+        return self.luts[dtype]
+
+    def _indices(self, chunk: Iterable[_T]) -> Iterable[int]:
+        """Translate the elements of `chunk` into indices in the alphabet."""
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = np.frombuffer(chunk, dtype=np.uint8)
+        if isinstance(chunk, np.ndarray) and chunk.dtype in _ARRAY_DTYPES:
+            idx = self._lut(chunk.dtype)[chunk]
+            if (missing := idx < 0).any():
+                raise KeyError(chunk[missing][0])
+            return idx.tolist()
+        return map(self.roots.__getitem__, chunk)
+
+    def _add(self, key: int, ret: MutableSequence[int]):
+        """Slow path of `update` for when the bag is full, tracks usage, or
+        has outgrown the dense table."""
+        if isinstance(self.table, memoryview) and self.next_code < self.max_codes:
+            self._grow()
+            self.table[key] = self.next_code
+            self.next_code += 1
+            return
+        w = key // len(self.alphabet)
+        self._touch(w)
+        if (code := self._new_code(w)) is not None:
+            self.table[key] = code
+            if self.policy == 'lru':
+                self.keys[code] = key
+                self._register(code, w)
+        elif self.policy == 'reset':
+            ret.append(self.clear_code)
+            self.reset()
+
+    def update(self, chunk: Iterable[_T]) -> list[int]:
+        """Consume `chunk` and return the codes it completed."""
+        ret = []
+        self._update(chunk, ret)
+        return ret
+
+    def _update(self, chunk: Iterable[_T], ret: MutableSequence[int]):
+        """`update`, appending the codes to `ret` (e.g. an `array.array`)."""
+        start, started = len(ret), self.w is not None
+        indices = iter(self._indices(chunk))
+        with phase('lzw.encode') as stats:
+            # switching scans whenever the table outgrows a dense array, or
+            # gets a new one after a reset
+            while not (self._scan_dense if isinstance(self.table, memoryview)
+                       else self._scan_sparse)(indices, ret):
+                pass
+        if stats:
+            if hasattr(chunk, '__len__') and len(chunk):
+                stats.count('lzw.encode.symbols', len(chunk))
+                # one bag lookup per element, except to start the stream
+                stats.count('lzw.encode.lookups', len(chunk) - (not started))
+            stats.count('lzw.encode.codes', len(ret) - start)
+            if self.clear_code is not None:
+                stats.count('lzw.resets', list(ret[start:]).count(self.clear_code))
+            stats.peak('lzw.bag', len(self.alphabet) + (
+                len(self.table) if self.policy == 'lru' else self.next_code - self.first_code))
+
+    # The two scans below differ only in how the table is looked up, which is
+    # the innermost operation: a subscript of the dense table, `dict.get` of
+    # the hash table. Codes are handed out inline until the bag (or the dense
+    # table) is full, unless tracking usage, and a full bag that is frozen
+    # needs no more attention.
+
+    def _scan_dense(self, indices: Iterator[int], ret: MutableSequence[int]) -> bool:
+        """The loop of `_update` over a dense table. Returns `False` if it
+        stopped early because the table was replaced by a hash table."""
+        w, nxt = self.w, self.next_code
+        table, nalph = self.table, len(self.alphabet)
+        limit = self.max_codes
+        fast, frozen = min(limit, self.rows), self.policy == 'freeze' and nxt >= limit
+        for cur in indices:
+            if w is None:
+                w = cur
+            elif k := table[key := w * nalph + cur]:
+                w = k  # the match can be extended: keep going
+            else:
+                # Output the match, register it extended by one element, and
+                # start over with the current element.
+                ret.append(w)
+                if nxt < fast:
+                    table[key] = nxt
+                    nxt += 1
+                elif not frozen:
+                    self.next_code = nxt
+                    self._add(key, ret)
+                    if not isinstance(self.table, memoryview):
+                        self.w = cur
+                        return False
+                    # in case of a reset or a larger table
+                    table, nxt = self.table, self.next_code
+                    fast, frozen = min(limit, self.rows), self.policy == 'freeze' and nxt >= limit
+                w = cur
+        self.w, self.next_code = w, nxt
+        return True
+
+    def _scan_sparse(self, indices: Iterator[int], ret: MutableSequence[int]) -> bool:
+        """The loop of `_update` over a hash table. Returns `False` if it
+        stopped early because a reset brought back a dense table."""
+        w, nxt = self.w, self.next_code
+        table, nalph = self.table, len(self.alphabet)
+        limit = self.max_codes if self.policy != 'lru' else -inf
+        frozen = self.policy == 'freeze' and nxt >= limit
+        for cur in indices:
+            if w is None:
+                w = cur
+            elif (k := table.get(key := w * nalph + cur)) is not None:
+                w = k
+            else:
+                ret.append(w)
+                if nxt < limit:
+                    table[key] = nxt
+                    nxt += 1
+                elif not frozen:
+                    self.next_code = nxt
+                    self._add(key, ret)
+                    if isinstance(self.table, memoryview):
+                        self.w = cur
+                        return False
+                    table, nxt = self.table, self.next_code  # in case of a reset
+                    frozen = self.policy == 'freeze' and nxt >= limit
+                w = cur
+        self.w, self.next_code = w, nxt
+        return True
+
+    def flush(self) -> list[int]:
+        """Finish the stream: return any pending code and `reset`."""
+        ret = [] if self.w is None else [self.w]
+        if stats := current():
+            stats.count('lzw.encode.codes', len(ret))
+        self.reset()
+        return ret
+
+
+class LZWDecoder(_LZWCoder[_T]):
+    """Incremental LZW decoder, the counterpart of `LZWEncoder`.
+
+    Takes the same arguments as `LZWEncoder`, and they have to be the same as
+    the ones used to encode: no more, no fewer elements, in the same order,
+    otherwise gibberish will ensue!
+
+    The bag is stored as ``(prefix_code, last_element, length)`` triples (plus
+    the first element of each phrase, needed to build new ones), so each new
+    phrase costs :math:`O(1)` time and memory, and each decoded phrase is
+    written out by walking back to front along its prefixes. Decoding is thus
+    linear in the length of the output, and memory is bounded by the number of
+    codes in the bag.
+
+    Output is `bytes` if the `alphabet` is `bytes`, a `str` if the `alphabet`
+    consists of characters, and a `list` otherwise.
+    """
+
+    def __init__(self, alphabet: Iterable[_T], max_codes: Optional[int] = None,
+                 policy: _Policy = 'freeze'):
+        super().__init__(alphabet, max_codes, policy)
+        self.join: Callable[[list[_T]], Sequence[_T]] = (
+            bytes if isinstance(alphabet, (bytes, bytearray)) else
+            ''.join if all(isinstance(a, str) and len(a) == 1 for a in self.alphabet) else
+            list)
+
+    def reset(self):
+        super().reset()
+        self.prefix = len(self.alphabet) * [-1]
+        self.last = list(self.alphabet)
+        self.length = len(self.alphabet) * [1]
+        self.first = list(self.alphabet)
+        if self.clear_code is not None:
+            for lst, val in ((self.prefix, -1), (self.last, None),
+                             (self.length, 0), (self.first, None)):
+                lst.append(val)
+        self.prev = None  # the previously decoded code
+
+    def _prefix(self, code: int) -> int:
+        return self.prefix[code]
+
+    def update(self, idx: Iterable[int]) -> Sequence[_T]:
+        """Decode the codes in `idx` and return the elements they represent."""
+        ret = []
+        prefix, last, length, first = self.prefix, self.last, self.length, self.first
+        prev, nxt = self.prev, self.next_code
+        lru, clear = self.policy == 'lru', self.clear_code
+        # Codes are handed out inline until the bag is full, unless tracking usage.
+        limit = self.max_codes if not lru else -inf
+        with phase('lzw.decode') as stats:
+            for i in idx:
+                if i == clear:
+                    self.reset()
+                    prefix, last, length, first = self.prefix, self.last, self.length, self.first
+                    prev, nxt = None, self.next_code
+                    continue
+                if prev is not None:
+                    if nxt < limit:
+                        code, nxt = nxt, nxt + 1
+                    else:
+                        self.next_code = nxt
+                        code, nxt = self._new_code(prev), self.next_code
+                    if code is not None:
+                        # The phrase that the encoder registered after emitting
+                        # prev, whose last element is the first one of the current
+                        # phrase. If i is exactly that phrase, it starts with prev's.
+                        el = first[i if i != code else prev]
+                        if code == len(prefix):
+                            prefix.append(prev)
+                            last.append(el)
+                            length.append(length[prev] + 1)
+                            first.append(first[prev])
+                        else:
+                            prefix[code], last[code], length[code], first[code] = (
+                                prev, el, length[prev] + 1, first[prev])
+                        if lru:
+                            self._register(code, prev)
+                if lru:
+                    self._touch(i)
+
+                phrase, c = [], i  # back to front
+                while c >= 0:
+                    phrase.append(last[c])
+                    c = prefix[c]
+                phrase.reverse()
+                ret += phrase
+                prev = i
+        if stats:
+            stats.count('lzw.decode.codes', len(idx) if hasattr(idx, '__len__') else 0)
+            stats.count('lzw.decode.symbols', len(ret))
+            stats.peak('lzw.bag', len(prefix))
+        self.prev, self.next_code = prev, nxt
+        return self.join(ret)
+
+    def flush(self) -> Sequence[_T]:
+        """Finish the stream and `reset`. Never produces any output."""
+        self.reset()
+        return self.join([])
+
+    def decode_array(self, idx: Sequence[int], dtype=None) -> np.ndarray:
+        """Decode a complete stream at once, vectorised with NumPy.
+
+        Every phrase added to the bag is the output of one step followed by
+        the first element of the next, i.e. a contiguous piece of the output.
+        Hence, each dynamic code is a copy of an earlier part of the output,
+        and both the lengths of the phrases and where each output element
+        ultimately comes from can be resolved by pointer jumping in
+        :math:`O(\\log(\\text{phrase length}))` vectorised passes, after
+        which the result is gathered into a single preallocated array.
+
+        Does not touch the state of the decoder. Not available for the
+        ``'lru'`` policy, for which the bag can't be predicted in bulk.
+
+        Args:
+            idx: all the codes from an encoder.
+            dtype: for the array of the alphabet (and the result).
+        """
+        if self.policy == 'lru':
+            raise ValueError('Cannot bulk-decode with the lru policy.')
+        with phase('lzw.decode_array') as stats:
+            ret = self._decode_array(idx, dtype)
+        if stats:
+            stats.count('lzw.decode.codes', len(idx))
+            stats.count('lzw.decode.symbols', len(ret))
+        return ret
+
+    def _decode_array(self, idx: Sequence[int], dtype=None) -> np.ndarray:
+        idx = np.asarray(idx, dtype=np.int64)
+        steps = np.arange(len(idx))
+        root = idx < len(self.alphabet)
+        clear = idx == (self.clear_code if self.clear_code is not None else -1)
+        dynamic = ~(root | clear)
+
+        # Dynamic code k in a segment (after the last clear code) was added
+        # right after step k - first_code of that segment and covers its
+        # output plus one element.
+        start = np.maximum.accumulate(np.where(clear, steps + 1, 0)) if clear.any() else 0
+        ref = np.where(dynamic, start + idx - self.first_code, steps)
+        if np.any(idx < 0) or np.any(dynamic & ((ref < start) | (ref >= steps) | (idx >= self.max_codes))):
+            raise ValueError('Invalid LZW code stream.')
+
+        # phrase length - 1 = number of hops to a root
+        hops, nxt = dynamic.astype(np.int64), ref
+        while (more := hops[nxt]).any():
+            hops, nxt = hops + more, nxt[nxt]
+        lens = np.where(clear, 0, hops + 1)
+        pos = np.cumsum(lens) - lens
+
+        # Where each output element is copied from (itself for roots).
+        src = np.arange(lens.sum()) + np.repeat(np.where(dynamic, pos[ref] - pos, 0), lens)
+        while not np.array_equal(nsrc := src[src], src):
+            src = nsrc
+
+        alphabet = np.asarray(self.alphabet, dtype=dtype)
+        out = np.empty(len(src), dtype=alphabet.dtype)
+        return np.take(alphabet, np.repeat(np.where(root, idx, 0), lens)[src], out=out)
@@ -0,0 +1,159 @@
+"""A binary container for LZW codes.
+
+The layout is a header followed by a number of frames::
+
+    magic      6s   b'KKLZW\\x01'
+    policy     B    index into ('freeze', 'reset', 'lru')
+    max_codes  Q    0 for an unbounded bag
+    len(alph)  H
+    alphabet   len(alph) bytes
+
+    ncodes     I    0 marks the end of the stream
+    codes      ceil(sum(widths) / 8) bytes
+
+Codes are packed most significant bit first at the smallest width that can
+represent any code the decoder may see at that position, starting from
+:math:`\\lceil \\log_2 |\\mathrm{alphabet}| \\rceil` bits and growing by one bit
+each time the bag doubles (up to ``max_codes``, if given). Frames are byte
+aligned, but the widths continue seamlessly from one frame to the next.
+"""
+
+import struct
+from itertools import chain
+from math import inf
+from typing import BinaryIO, Callable, Iterable, Optional
+
+import numpy as np
+
+from .._files import _mapped, _PathLike
+from .coders import _LZWCoder, _Policy, LZWDecoder, LZWEncoder
+
+
+__all__ = 'lzw_compress_file', 'lzw_decompress_file'
+
+
+MAGIC = b'KKLZW\x01'
+
+_header = struct.Struct('<6sBQH')
+_frame = struct.Struct('<I')
+
+_CHUNK_SIZE = 2**18
+
+
+def _lazy(func):
+    """Call `func` only when iterated over, and yield the result."""
+    yield func()
+
+
+def code_widths(coder: _LZWCoder, start: int, n: int) -> np.ndarray:
+    """Bit widths of the codes at positions ``start:start+n`` of the stream.
+
+    Every code the encoder emits adds (or at least attempts to add) one phrase
+    to the bag, so the range of possible values at each position is known in
+    advance. With the ``'reset'`` policy the "clear" code always comes right
+    after the one emitted with a full bag, so the widths are periodic.
+    """
+    pos = np.arange(start, start + n, dtype=np.int64)
+    if coder.policy == 'reset':
+        pos %= coder.max_codes - coder.first_code + 2
+    ncodes = coder.first_code + pos
+    if coder.max_codes < inf:
+        np.minimum(ncodes, coder.max_codes, out=ncodes)
+    # frexp's exponent is exactly the bit length for (not too large) integers
+    return np.maximum(np.frexp(ncodes - 1)[1], 1)
+
+
+def pack_codes(codes: np.ndarray, widths: np.ndarray) -> bytes:
+    """Pack `codes` into bytes, each at the corresponding bit width."""
+    codes = np.asarray(codes, dtype=np.int64)
+    if np.any(codes >> widths):
+        raise ValueError('Codes do not fit in the given widths.')
+    w = widths.max(initial=1)
+    bits = (codes[:, None] >> np.arange(w-1, -1, -1)).astype(np.uint8) & 1
+    return np.packbits(bits[np.arange(w) >= (w - widths)[:, None]]).tobytes()
+
+
+def unpack_codes(buf: bytes, widths: np.ndarray) -> np.ndarray:
+    """The inverse of `pack_codes`."""
+    bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8))
+    w = widths.max(initial=1)
+    idx = (np.cumsum(widths) - widths)[:, None] + np.arange(w)
+    valid = np.arange(w) < widths[:, None]
+    return np.where(
+        valid, bits[np.where(valid, idx, 0)].astype(np.int64)
+               << np.maximum(widths[:, None] - 1 - np.arange(w), 0), 0
+    ).sum(-1)
+
+
+def _dump(chunks: Iterable[bytes], out: BinaryIO, encoder: LZWEncoder[int]) -> int:
+    alphabet = bytes(encoder.alphabet)
+    written = out.write(_header.pack(
+        MAGIC, encoder.policies.index(encoder.policy),
+        encoder.max_codes if encoder.max_codes < inf else 0,
+        len(alphabet)
+    )) + out.write(alphabet)
+
+    pos = 0
+    for codes in chain(map(encoder.update, chunks), _lazy(encoder.flush)):
+        if codes:  # an empty frame would mark the end
+            written += out.write(_frame.pack(len(codes))) + out.write(
+                pack_codes(codes, code_widths(encoder, pos, len(codes))))
+            pos += len(codes)
+    return written + out.write(_frame.pack(0))
+
+
+def _load(read: Callable[[int], bytes], out: BinaryIO) -> int:
+    """Decode a container, read sequentially with `read` (e.g. from a pipe),
+    into `out`."""
+    magic, policy, max_codes, nalph = _header.unpack(read(_header.size))
+    if magic != MAGIC:
+        raise ValueError('Not an LZW container.')
+    decoder = LZWDecoder(read(nalph), max_codes or None, LZWDecoder.policies[policy])
+
+    written = pos = 0
+    while ncodes := _frame.unpack(read(_frame.size))[0]:
+        widths = code_widths(decoder, pos, ncodes)
+        nbytes = (int(widths.sum()) + 7) // 8
+        written += out.write(bytes(decoder.update(unpack_codes(read(nbytes), widths).tolist())))
+        pos += ncodes
+    return written
+
+
+def lzw_compress_file(src: _PathLike, dst: _PathLike,
+                      alphabet: Iterable[int] = range(256),
+                      max_codes: Optional[int] = None, policy: _Policy = 'freeze',
+                      chunk_size: int = _CHUNK_SIZE) -> int:
+    """Compress the file `src` into the LZW container `dst`.
+
+    The source is memory-mapped and fed to an `LZWEncoder` in chunks of
+    `chunk_size` bytes, and each chunk's codes are bit-packed and written out
+    right away, so memory use does not depend on the size of the file.
+
+    Args:
+        src: path to the file to compress.
+        dst: path to the output file (which will be overwritten).
+        alphabet: the byte values that may occur in `src`. Restricting it, e.g.
+            to ``b'0123456789'``, leads to narrower codes.
+        max_codes: bound on the size of the bag. See `LZWEncoder`.
+        policy: what to do when the bag is full. See `LZWEncoder`.
+        chunk_size: how many bytes to encode at a time.
+
+    Returns:
+        The size of the compressed file in bytes.
+
+    See Also:
+        `lzw_decompress_file`
+    """
+    with _mapped(src) as buf, open(dst, 'wb') as out:
+        return _dump((buf[i:i+chunk_size] for i in range(0, len(buf), chunk_size)),
+                     out, LZWEncoder(alphabet, max_codes, policy))
+
+
+def lzw_decompress_file(src: _PathLike, dst: _PathLike) -> int:
+    """Decompress the LZW container `src` (see `lzw_compress_file`) into `dst`.
+
+    Returns:
+        The size of the decompressed file in bytes.
+    """
+    with open(src, 'rb') as f, open(dst, 'wb') as out:
+        return _load(f.read, out)
@@ -0,0 +1,110 @@
+"""Opt-in instrumentation of the hot paths.
+
+The algorithms report the time they spend in their phases (e.g. classifying
+the suffixes vs induce-sorting them in `suffix_array`) and count what they do
+(e.g. recursion levels), but only inside a `profile` block::
+
+    with profile() as stats:
+        suffix_array(data)
+    print(stats)
+
+Outside one, instrumented code only checks (once per phase, never per
+element) whether profiling is on, so there is no overhead to speak of.
+
+The `Stats` being collected are kept in a `~contextvars.ContextVar`, so
+`profile` blocks in different threads (or `asyncio` tasks) collect separately.
+New threads, e.g. those of a ``pool='thread'`` in `bwt_encode_many` and
+friends, start with profiling off.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from typing import ContextManager, Iterator, Optional
+
+
+__all__ = 'profile', 'Stats'
+
+
+class Stats:
+    """Phase timings and counters collected during a `profile` block.
+
+    Attributes:
+        times: the wall time (in seconds) spent in each phase, *excluding*
+            the phases nested in it, so that they add up to the total.
+        calls: how many times each phase was entered.
+        counters: counts (or peak values, see `peak`) of things, by name.
+    """
+    __slots__ = 'times', 'calls', 'counters', '_stack'
+
+    def __init__(self):
+        self.times: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+        self.counters: dict[str, int] = defaultdict(int)
+        self._stack: list[float] = []  # time spent in nested phases
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator['Stats']:
+        """Time the enclosed block as the phase `name`."""
+        self._stack.append(0.)
+        start = perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = perf_counter() - start
+            self.times[name] += elapsed - self._stack.pop()
+            self.calls[name] += 1
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def count(self, name: str, n: int = 1):
+        """Add `n` to the counter `name`."""
+        self.counters[name] += n
+
+    def peak(self, name: str, value: int):
+        """Keep the largest `value` seen as the counter `name`."""
+        self.counters[name] = max(self.counters.get(name, value), value)
+
+    def report(self) -> str:
+        """A table of the phases (slowest first) and the counters."""
+        lines = [f'{"phase":32} {"calls":>8} {"time, s":>10}']
+        lines += [f'{name:32} {self.calls[name]:8} {t:10.4g}'
+                  for name, t in sorted(self.times.items(), key=lambda item: -item[1])]
+        if self.counters:
+            lines += ['', f'{"counter":32} {"value":>19}']
+            lines += [f'{name:32} {value:19}' for name, value in sorted(self.counters.items())]
+        return '\n'.join(lines)
+
+    __str__ = report
+
+
+_current: ContextVar[Optional[Stats]] = ContextVar('_current', default=None)
+
+_disabled = nullcontext()
+
+
+@contextmanager
+def profile() -> Iterator[Stats]:
+    """Collect `Stats` from the instrumented code run in the block.
+
+    Nested blocks collect separately: the outer one sees nothing of what
+    happens in the inner one.
+    """
+    token = _current.set(Stats())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def phase(name: str) -> ContextManager[Optional[Stats]]:
+    """Time the enclosed block as the phase `name` if profiling, and give the
+    current `Stats` (or `None`) for counting."""
+    stats = _current.get()
+    return _disabled if stats is None else stats.phase(name)
+
+
+def current() -> Optional[Stats]:
+    """The `Stats` being collected, or `None` if not profiling."""
+    return _current.get()
@@ -0,0 +1,123 @@
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Sequence, Union
+
+import numpy as np
+
+from ..bwt import bwt_decode, bwt_encode
+from ..lzw import lzw_decode, lzw_encode
+from .huffman import huffman_decode, huffman_encode
+from .mtf import mtf_decode, mtf_encode
+from .rle import rle_decode, rle_encode
+
+
+__all__ = ('mtf_encode', 'mtf_decode', 'rle_encode', 'rle_decode',
+           'huffman_encode', 'huffman_decode', 'Stage', 'Pipeline', 'pipeline')
+
+
+_BLOCK_SIZE = 900_000
+
+
+class Stage(NamedTuple):
+    """A reversible transformation of a block, given as a pair of functions.
+
+    Blocks are NumPy arrays of non-negative integers, except for the output
+    of the last stage, which can be anything `decode` understands.
+    """
+    name: str
+    encode: Callable[[np.ndarray], Any]
+    decode: Callable[[Any], np.ndarray]
+
+
+def _bwt_encode(block: np.ndarray) -> np.ndarray:
+    """The BWT with the end marker as ``0`` (and everything else shifted)."""
+    data, primary = bwt_encode(block, primary=True)
+    return np.insert(data.astype(np.int64) + 1, primary, 0)
+
+
+def _bwt_decode(block: np.ndarray) -> np.ndarray:
+    primary = int(np.argmin(block))
+    return bwt_decode((np.delete(block, primary) - 1, primary))
+
+
+def _lzw_encode(block: np.ndarray) -> np.ndarray:
+    """LZW over ``range(sigma)``, with `sigma` prepended. Only blocks that fit
+    in ``uint16`` take the array path of `lzw_encode`."""
+    sigma = int(block.max()) + 1 if len(block) else 0
+    if sigma <= 1 << 16:
+        codes = lzw_encode(block.astype(np.uint16), range(sigma))
+    else:
+        codes = np.fromiter(lzw_encode(block.tolist(), range(sigma)), dtype=np.int64)
+    return np.append(sigma, codes)
+
+
+def _lzw_decode(block: np.ndarray) -> np.ndarray:
+    return lzw_decode(block[1:], range(block[0]))
+
+
+STAGES = {stage.name: stage for stage in (
+    Stage('bwt', _bwt_encode, _bwt_decode),
+    Stage('mtf', mtf_encode, mtf_decode),
+    Stage('rle', rle_encode, rle_decode),
+    Stage('lzw', _lzw_encode, _lzw_decode),
+    Stage('huffman', huffman_encode, huffman_decode),
+)}
+
+
+class Pipeline:
+    """A chain of `Stage`\\ s applied block by block.
+
+    Args:
+        stages: the stages, in the order of encoding, as `Stage` objects or
+            names of the built-in ones (see `pipeline`).
+        block_size: the size of the blocks the input is split into.
+
+    Attributes:
+        times: the total time spent in each stage (by name), as a list of the
+            encoding and decoding times, for measuring the throughput.
+    """
+
+    def __init__(self, stages: Iterable[Union[str, Stage]], block_size: int = _BLOCK_SIZE):
+        self.stages: Sequence[Stage] = [STAGES[s] if isinstance(s, str) else s for s in stages]
+        self.block_size = block_size
+        self.times = {stage.name: [0., 0.] for stage in self.stages}
+
+    def _run(self, block, stages: Iterable[Stage], which: int):
+        for stage in stages:
+            start = perf_counter()
+            block = stage[1 + which](block)
+            self.times[stage.name][which] += perf_counter() - start
+        return block
+
+    def encode(self, data: bytes) -> Iterator:
+        """Encode `data` (anything that can be sliced into `bytes`) lazily,
+        one block at a time.
+
+        Returns:
+            The outputs of the last stage for each block.
+        """
+        return (self._run(np.frombuffer(data[i:i+self.block_size], dtype=np.uint8), self.stages, 0)
+                for i in range(0, len(data), self.block_size))
+
+    def decode(self, blocks: Iterable) -> Iterator[bytes]:
+        """The inverse of `encode`, again lazy.
+
+        Returns:
+            The decoded blocks.
+        """
+        return (self._run(block, reversed(self.stages), 1).astype(np.uint8).tobytes()
+                for block in blocks)
+
+
+def pipeline(stages: Iterable[Union[str, Stage]], block_size: int = _BLOCK_SIZE) -> Pipeline:
+    """Chain compression stages into a block-wise compressor.
+
+    The built-in stages are ``'bwt'`` (see `bwt_encode`, with the end marker
+    as ``0``), ``'mtf'`` (`mtf_encode`), ``'rle'`` (`rle_encode`), ``'lzw'``
+    (see `lzw_encode`, over all values up to the largest one in the block)
+    and ``'huffman'`` (`huffman_encode`), which should come last. For example,
+    ``pipeline(['bwt', 'mtf', 'rle', 'huffman'])`` is much like bzip2.
+
+    See Also:
+        `Pipeline`
+    """
+    return Pipeline(stages, block_size)
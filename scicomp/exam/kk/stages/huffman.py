@@ -0,0 +1,153 @@
+"""Canonical Huffman coding of integer sequences.
+
+The output is self-contained::
+
+    n          Q    number of elements
+    sigma      I    size of the alphabet (one more than the largest element)
+    size       I    of the lengths
+    lengths    size bytes: the code length of each element (0 if unused)
+    codes      the codes, bit-packed as in `scicomp.exam.kk.lzw.container`
+
+For alphabets of up to `RAW_LENGTHS` elements, the lengths are stored one
+byte each. Larger ones, e.g. the code spaces after LZW, would make for
+headers bigger than the data, so, like in DEFLATE, the lengths are compressed
+themselves: their runs of zeros with `rle_encode` and the result with
+`huffman_encode`, whose alphabet is then small.
+"""
+
+import heapq
+import struct
+from typing import Iterable
+
+import numpy as np
+
+from ..lzw.container import pack_codes
+from .rle import rle_decode, rle_encode
+
+
+__all__ = 'huffman_encode', 'huffman_decode'
+
+
+MAX_BITS = 20
+
+RAW_LENGTHS = 256
+
+_header = struct.Struct('<QII')
+
+
+def code_lengths(freqs: np.ndarray, max_bits: int = MAX_BITS) -> np.ndarray:
+    """Huffman code lengths for the given frequencies, at most `max_bits`.
+
+    Lengths are limited as in bzip2: if the tree is too deep, the frequencies
+    are flattened (halved, keeping them positive) and the tree is rebuilt.
+    """
+    freqs = np.asarray(freqs, dtype=np.int64)
+    used = np.flatnonzero(freqs)
+    m = len(used)
+    lengths = np.zeros(len(freqs), dtype=np.int64)
+    if m == 1:
+        lengths[used] = 1
+    while m > 1:
+        # leaves are nodes 0..m-1, and merged nodes follow in order
+        heap = list(zip(freqs[used].tolist(), range(m)))
+        heapq.heapify(heap)
+        parent = [0] * (2*m - 1)
+        for node in range(m, 2*m - 1):
+            (f1, i1), (f2, i2) = heapq.heappop(heap), heapq.heappop(heap)
+            parent[i1] = parent[i2] = node
+            heapq.heappush(heap, (f1 + f2, node))
+        depth = [0] * (2*m - 1)
+        for node in range(2*m - 3, -1, -1):  # parents come later
+            depth[node] = depth[parent[node]] + 1
+        lengths[used] = depth[:m]
+        if lengths.max() <= max_bits:
+            break
+        freqs = np.where(freqs > 0, freqs // 2 + 1, 0)
+    return lengths
+
+
+def canonical_codes(lengths: np.ndarray) -> np.ndarray:
+    """The canonical Huffman codes for the given code lengths: consecutive
+    integers in order of length (and then element), shifted left whenever
+    the length increases."""
+    order = np.lexsort((np.arange(len(lengths)), lengths))
+    order = order[lengths[order] > 0]
+    ls = lengths[order].tolist()
+    codes = np.zeros(len(lengths), dtype=np.int64)
+    code = 0
+    for i, (sym, l) in enumerate(zip(order.tolist(), ls)):
+        if i:
+            code = (code + 1) << (l - ls[i-1])
+        codes[sym] = code
+    return codes
+
+
+def huffman_encode(seq: Iterable[int]) -> bytes:
+    """Compress a sequence of non-negative integers with a canonical Huffman
+    code built from its frequencies.
+
+    Returns:
+        The self-contained compressed data (see the module description).
+
+    See Also:
+        `huffman_decode`
+    """
+    seq = np.asarray(seq if isinstance(seq, np.ndarray) else list(seq), dtype=np.int64)
+    freqs = np.bincount(seq)
+    lengths = code_lengths(freqs)
+    header = (lengths.astype(np.uint8).tobytes() if len(freqs) <= RAW_LENGTHS
+              else huffman_encode(rle_encode(lengths)))
+    return (_header.pack(len(seq), len(freqs), len(header)) + header
+            + pack_codes(canonical_codes(lengths)[seq], lengths[seq]))
+
+
+def _walk(nxt: memoryview, out: memoryview):
+    """Follow `nxt` from bit 0, recording where each code starts."""
+    p = 0
+    for k in range(len(out)):
+        out[k] = p
+        p = nxt[p]
+
+
+def huffman_decode(buf: bytes) -> np.ndarray:
+    """The inverse of `huffman_encode`.
+
+    The codes are decoded in bulk, as if each one started at each bit, through
+    a lookup table of the next `MAX_BITS` (at most) bits. Only following the
+    chain of code starts from the first bit is done one code at a time.
+
+    Returns:
+        The decoded sequence as an ``int64`` array.
+    """
+    n, sigma, size = _header.unpack_from(buf)
+    offset = _header.size + size
+    header = buf[_header.size:offset]
+    lengths = (np.frombuffer(header, dtype=np.uint8).astype(np.int64) if sigma <= RAW_LENGTHS
+               else rle_decode(huffman_decode(header)))
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+
+    # every window of w bits starts with the code of exactly one element
+    w = int(lengths.max())
+    codes = canonical_codes(lengths)
+    used = np.flatnonzero(lengths)
+    used = used[np.argsort(codes[used] << (w - lengths[used]))]
+    span = 1 << (w - lengths[used])
+    lut_sym = np.repeat(used.astype(np.min_scalar_type(sigma)), span)
+    lut_len = np.repeat(lengths[used].astype(np.uint8), span)
+
+    bits = np.unpackbits(np.frombuffer(buf, dtype=np.uint8, offset=offset))
+    bits = np.append(bits, np.zeros(w, dtype=np.uint8))
+    # built one bit position at a time, so that it takes 4 bytes per bit
+    # (rather than a word for each bit of each window)
+    m = len(bits) - w
+    windows = np.zeros(m, dtype=np.uint32)
+    for k in range(w):
+        windows <<= 1
+        windows |= bits[k:k+m]
+    del bits
+    nxt = np.arange(m, dtype=np.min_scalar_type(m + w))
+    nxt += lut_len[windows]
+    starts = np.empty(n, dtype=nxt.dtype)
+    _walk(memoryview(nxt), memoryview(starts))
+    return lut_sym[windows[starts]].astype(np.int64)
@@ -0,0 +1,79 @@
+from typing import Iterable
+
+import numpy as np
+
+
+__all__ = 'mtf_encode', 'mtf_decode'
+
+
+def _heads(seq: np.ndarray) -> np.ndarray:
+    """Where the runs of equal elements in `seq` start."""
+    return np.flatnonzero(np.append(True, seq[1:] != seq[:-1])) if len(seq) else np.arange(0)
+
+
+def _mtf(symbols: list[int]) -> list[int]:
+    front, ret = [], []
+    for c in symbols:
+        try:
+            i = front.index(c)
+        except ValueError:  # first occurrence: after the seen, among the rest
+            i = c + sum(x > c for x in front)
+        else:
+            del front[i]
+        front.insert(0, c)
+        ret.append(i)
+    return ret
+
+
+def _unmtf(idx: list[int]) -> list[int]:
+    front, ret = [], []
+    for i in idx:
+        if i < len(front):
+            c = front.pop(i)
+        else:  # the (i - len(front))-th symbol not seen so far
+            c = i - len(front)
+            for x in sorted(front):
+                c += x <= c
+        front.insert(0, c)
+        ret.append(c)
+    return ret
+
+
+def mtf_encode(seq: Iterable[int]) -> np.ndarray:
+    """Move-to-front transform of a sequence of non-negative integers.
+
+    Each element is replaced by its position in a list of all integers,
+    initially in increasing order, and then moved to the front of it. Runs of
+    equal elements become runs of zeros, which is what makes the BWT
+    compressible. Only the first element of each run needs a (Python-level)
+    list lookup, and the list holds just the elements seen so far.
+
+    Returns:
+        The positions as an ``int64`` array.
+
+    See Also:
+        `mtf_decode`
+    """
+    seq = np.asarray(seq if isinstance(seq, np.ndarray) else list(seq), dtype=np.int64)
+    ret = np.zeros(len(seq), dtype=np.int64)
+    heads = _heads(seq)
+    ret[heads] = _mtf(seq[heads].tolist())
+    return ret
+
+
+def mtf_decode(idx: Iterable[int]) -> np.ndarray:
+    """The inverse of `mtf_encode`.
+
+    Zeros repeat the previous element, so only the other positions (and the
+    very first one) are looked up, and the rest is filled in in bulk.
+    """
+    idx = np.asarray(idx if isinstance(idx, np.ndarray) else list(idx), dtype=np.int64)
+    heads = np.flatnonzero(idx)
+    if len(idx) and (not len(heads) or heads[0]):
+        heads = np.insert(heads, 0, 0)
+    ret = np.zeros(len(idx), dtype=np.int64)
+    ret[heads] = _unmtf(idx[heads].tolist())
+    # index of the last looked up position, for each position
+    last = np.zeros(len(idx), dtype=np.int64)
+    last[heads] = heads
+    return ret[np.maximum.accumulate(last)]
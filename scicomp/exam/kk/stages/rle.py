@@ -0,0 +1,62 @@
+from typing import Iterable
+
+import numpy as np
+
+
+__all__ = 'rle_encode', 'rle_decode'
+
+
+RUNA, RUNB = 0, 1
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Starts and lengths of the runs of `True` in `mask`."""
+    d = np.diff(mask.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(d == 1)
+    return starts, np.flatnonzero(d == -1) - starts
+
+
+def rle_encode(seq: Iterable[int]) -> np.ndarray:
+    """Run-length encode the zeros in a sequence of non-negative integers,
+    as bzip2 does after the move-to-front transform.
+
+    A run of :math:`n` zeros is written as the digits of :math:`n` in
+    bijective base 2, least significant first, with the digits ``1`` and
+    ``2`` represented by `RUNA` (``0``) and `RUNB` (``1``), and every other
+    element is incremented by one. A run thus takes up :math:`\\lfloor
+    \\log_2 (n + 1) \\rfloor` elements, and no lengths need to be stored.
+
+    Returns:
+        The encoded sequence as an ``int64`` array.
+
+    See Also:
+        `rle_decode`
+    """
+    seq = np.asarray(seq if isinstance(seq, np.ndarray) else list(seq), dtype=np.int64)
+    zero = seq == 0
+    starts, lengths = _runs(zero)
+    ndigits = np.frexp(lengths + 1)[1] - 1
+
+    sizes = np.where(zero, 0, 1)
+    sizes[starts] = ndigits
+    offsets = np.cumsum(sizes) - sizes
+
+    ret = np.empty(sizes.sum(), dtype=np.int64)
+    ret[offsets[~zero]] = seq[~zero] + 1
+    run = np.repeat(np.arange(len(starts)), ndigits)
+    digit = np.arange(len(run)) - np.repeat(np.cumsum(ndigits) - ndigits, ndigits)
+    ret[offsets[starts][run] + digit] = (lengths[run] + 1) >> digit & 1
+    return ret
+
+
+def rle_decode(seq: Iterable[int]) -> np.ndarray:
+    """The inverse of `rle_encode`."""
+    seq = np.asarray(seq if isinstance(seq, np.ndarray) else list(seq), dtype=np.int64)
+    digits = seq <= RUNB
+    starts, ndigits = _runs(digits)
+    run = np.repeat(np.arange(len(starts)), ndigits)
+    digit = np.arange(len(run)) - np.repeat(np.cumsum(ndigits) - ndigits, ndigits)
+
+    sizes = np.where(digits, 0, 1)
+    sizes[starts] = np.bincount(run, (seq[digits] + 1) << digit, minlength=len(starts))
+    return np.repeat(np.where(digits, 0, seq - 1), sizes)
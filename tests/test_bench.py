@@ -0,0 +1,47 @@
+import json
+
+from scicomp.exam.kk.bench import _pi, BENCHMARKS, compare, CORPORA, exponent, main, run
+
+
+def test_pi():
+    assert _pi(30) == b'314159265358979323846264338327'
+
+
+def test_exponent():
+    sizes = [10, 100, 1000]
+    assert abs(exponent(sizes, [2e-3 * n**1.5 for n in sizes]) - 1.5) < 1e-6
+
+
+def test_run():
+    results = run(sizes=(50, 100), repeat=1)
+    assert set(results['results']) == {f'{b}:{c}' for b in BENCHMARKS for c in CORPORA}
+    for res in results['results'].values():
+        assert res['sizes'] == [50, 100] and len(res['times']) == 2
+        assert isinstance(res['exponent'], float)
+    json.dumps(results)
+
+
+def test_compare():
+    base = {'results': {
+        'a:x': {'sizes': [10, 100], 'times': [1., 10.], 'exponent': 1.},
+        'b:x': {'sizes': [10, 100], 'times': [1., 10.], 'exponent': 1.},
+    }}
+    results = {'results': {
+        'a:x': {'sizes': [10, 100], 'times': [1., 11.], 'exponent': 1.04},
+        'b:x': {'sizes': [10, 100], 'times': [1., 100.], 'exponent': 2.},
+        'c:x': {'sizes': [10, 100], 'times': [1., 100.], 'exponent': 2.},
+    }}
+    assert compare(results, base) == [
+        'b:x: 100 s vs 10 s at n=100 (10.00x)', 'b:x: scales as n^2.00 vs n^1.00']
+    assert compare(base, base) == []
+
+
+def test_main(tmp_path):
+    args = ['-b', 'suffix_array', '-c', 'random', '-n', '100', '200', '-r', '1']
+    assert main([*args, '-o', str(tmp_path / 'base.json')]) == 0
+    base = json.loads((tmp_path / 'base.json').read_text())
+    assert list(base['results']) == ['suffix_array:random']
+    assert main([*args, '-o', str(tmp_path / 'new.json'), '--baseline', str(tmp_path / 'base.json'),
+                 '--tolerance', '1e6', '--exponent-tolerance', '1e6']) == 0
+    assert main([*args, '-o', str(tmp_path / 'new.json'), '--baseline', str(tmp_path / 'base.json'),
+                 '--tolerance', '1e-6']) == 1
@@ -1,12 +1,83 @@
+import math
+import os
+import random
+import tracemalloc
 from itertools import zip_longest
 
+import numpy as np
 import pytest
 from more_itertools import circular_shifts, last
 
-from scicomp.exam.kk.bwt import _end_marker, bwt_decode, bwt_encode
-from utils import random_strings
+from scicomp.exam.kk.bwt import (
+    _end_marker, bwt_decode, bwt_decode_blocks, bwt_decode_file, bwt_encode,
+    bwt_encode_blocks, bwt_encode_file, bwt_encode_many, FMIndex)
+from scicomp.exam.kk.bwt.collections import BucketArray, Buckets
+from scicomp.exam.kk.bwt.suffix_array import lcp_array, suffix_array
+from scicomp.exam.kk.profiling import profile
+from utils import _get_random_string, random_strings
 
 
+@pytest.mark.parametrize('s', (
+    s[:len(s) // 2] * (len(s) % 3 + 1)  # some repetitive ones, too
+    for s in random_strings(1, 2000, N=100)))
+def test_suffix_array(s):
+    expected = sorted(range(len(s) + 1), key=lambda i: s[i:])
+    assert suffix_array(s).tolist() == expected
+    assert suffix_array(s.encode()).tolist() == expected
+    assert suffix_array(list(s)).tolist() == expected
+    assert suffix_array(np.frombuffer(s.encode(), dtype=np.uint8)).tolist() == expected
+    assert suffix_array(s + '\0', assume_marked=True).tolist() == expected
+    assert suffix_array(s, method='doubling').tolist() == expected
+
+
+@pytest.mark.parametrize('s', (
+    s * (len(s) % 4 + 1) for s in random_strings(1000, 50000, N=20)))
+def test_suffix_array_doubling(s):
+    assert np.array_equal(suffix_array(s, method='doubling'), suffix_array(s))
+
+
+def _peak(func, *args) -> int:
+    """Peak memory allocated by `func(*args)`. The first run only warms up,
+    so that one-off allocations (e.g. of coverage, for the lines it has not
+    seen yet) are not counted."""
+    func(*args)
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('n', (10, 100, 1000, 10000, 100000))
+def test_suffix_array_levels(n):
+    a, b = 'a', 'ab'  # Fibonacci words reduce for about as long as they can
+    while len(b) < n:
+        a, b = b, b + a
+    s = (b[:n] + random.choice('ab')).encode()
+    with profile() as stats:
+        sa = suffix_array(s)
+    assert np.array_equal(sa, suffix_array(s, method='doubling'))
+    assert stats.counters['suffix_array.levels'] > 0.25 * math.log2(n)
+    # The workspace (a word per element), the int32 ranks, and at most half
+    # a word more (the int32 codes and S*-positions of a level) whatever the
+    # levels, so about 2.5 words per element; random bytes, whose reduced
+    # string has many distinct names, need bucket pointers for those too.
+    for s in (s, os.urandom(n)):
+        assert _peak(suffix_array, s) < 3.25 * 8 * len(s) + 50000
+
+
+@pytest.mark.parametrize('s', (
+    s[:len(s) // 2] * (len(s) % 3 + 1) for s in random_strings(1, 2000, N=100)))
+def test_lcp_array(s):
+    sa = suffix_array(s)
+    expected = [0] + [
+        len(os.path.commonprefix((s[i:], s[j:]))) for i, j in zip(sa, sa[1:])]
+    assert lcp_array(s, sa).tolist() == expected
+    for method in ('sais', 'doubling'):
+        sa_, lcp = suffix_array(s, method=method, return_lcp=True)
+        assert np.array_equal(sa_, sa) and lcp.tolist() == expected
+
 
 @pytest.mark.parametrize(
     's', (s for s in random_strings(100, 5000, N=100)))
@@ -24,3 +95,85 @@ def test_bwt_encode(s):
     's', (s for s in random_strings(100, 5000, N=100)))
 def test_bwt_roundtrip(s):
     assert ''.join(bwt_decode(bwt_encode(s))) == s
+    assert ''.join(bwt_decode(bwt_encode(s, method='doubling'))) == s
+    assert list(bwt_decode(bwt_encode(list(map(ord, s))))) == list(map(ord, s))
+
+
+@pytest.mark.parametrize('s', (
+    s[:len(s) // 2] * (len(s) % 3 + 1) for s in random_strings(0, 2000, N=30)))
+def test_fm_index(s):
+    patterns = [s[i:i+k] for i in random.choices(range(len(s) + 1), k=5) for k in (1, 2, 5, 20)]
+    patterns += [_get_random_string(k) for k in range(4)] + ['', '\0', s]
+    for index in (FMIndex(s, occ_step=16, sa_step=8), FMIndex(list(s)), FMIndex(s.encode())):
+        assert len(index) == len(s)
+        for p in patterns:
+            expected = [i for i in range(len(s) + 1) if s.startswith(p, i)]
+            p = p.encode() if isinstance(index.alphabet, np.ndarray) and index.alphabet.dtype == np.uint8 else p
+            assert index.count(p) == len(expected)
+            assert index.locate(p).tolist() == expected
+
+
+@pytest.mark.parametrize('s', (
+    s[:len(s) // 2].encode() * (len(s) % 3 + 1) + bytes(random.choices(range(256), k=len(s)))
+    for s in random_strings(0, 3000, N=20)))
+def test_bwt_blocks(s):
+    block_size = random.randint(1, 1000)
+    blocks = list(bwt_encode_blocks(s, block_size, workers=1))
+    assert len(blocks) == -(-len(s) // block_size)
+    for (data, primary), i in zip(blocks, range(0, len(s), block_size)):
+        expected = list(bwt_encode(s[i:i+block_size]))
+        assert expected[primary] is _end_marker
+        assert data == bytes(expected[:primary] + expected[primary+1:])
+    assert b''.join(bwt_decode_blocks(blocks, workers=1)) == s
+
+
+def test_bwt_file(tmp_path):
+    src, dst, res = (tmp_path / name for name in ('src', 'dst', 'res'))
+    src.write_bytes(data := bytes(random.choices(range(256), k=5000)) + b'abc' * 2000)
+    assert bwt_encode_file(src, dst, block_size=1000, workers=2) == dst.stat().st_size
+    assert bwt_decode_file(dst, res, workers=2) == len(data)
+    assert res.read_bytes() == data
+
+
+@pytest.mark.parametrize('s', (s for s in random_strings(0, 2000, N=50)))
+def test_bwt_primary(s):
+    expected = list(bwt_encode(s))
+    for seq in (s, s.encode(), np.frombuffer(s.encode(), dtype=np.uint8), list(s)):
+        data, primary = bwt_encode(seq, primary=True)
+        assert type(data) is type(seq) and expected[primary] is _end_marker
+        assert list(data) == list(bwt_encode(seq))[:primary] + list(bwt_encode(seq))[primary+1:]
+        decoded = bwt_decode((data, primary))
+        assert type(decoded) is type(seq) and np.array_equal(decoded, seq)
+
+
+@pytest.mark.parametrize(('workers', 'pool'), ((1, 'process'), (2, 'process'), (2, 'thread')))
+def test_bwt_encode_many(workers, pool):
+    seqs = list(random_strings(0, 500, N=100))
+    seqs += [seqs[0].encode(), list(seqs[1]), np.frombuffer(seqs[2].encode(), dtype=np.uint8),
+             np.arange(1 << 17) % 3]  # 1 MiB, i.e. through shared memory
+    expected = [bwt_encode(seq, primary=True) for seq in seqs]
+    for ordered in (True, False):
+        results = list(bwt_encode_many(seqs, workers=workers, pool=pool, chunksize=9, ordered=ordered))
+        if not ordered:
+            assert sorted(i for i, _ in results) == list(range(len(seqs)))
+            results = [ret for _, ret in sorted(results, key=lambda item: item[0])]
+        for (data, primary), (data_, primary_) in zip(results, expected):
+            assert type(data) is type(data_) and np.array_equal(data, data_) and primary == primary_
+
+
+@pytest.mark.parametrize('s', random_strings(0, 100, N=20))
+def test_buckets(s):
+    seq = np.frombuffer(s.encode(), dtype=np.uint8)
+    buckets = Buckets(seq, 256)
+    assert len(buckets) == 256
+    for c in range(256):
+        assert buckets[c].stop - buckets[c].start == s.count(chr(c))
+
+    arr = BucketArray(buckets)
+    assert len(arr) == len(s) and list(arr) == len(s) * [-1]
+    for i in random.sample(range(len(s)), len(s)):  # fill from both ends
+        (arr.push_head if i % 2 else arr.push_tail)(seq[i], i)
+    for c in range(256):
+        assert sorted(arr.data[buckets[c]]) == [i for i in range(len(s)) if seq[i] == c]
+    arr.clear()
+    assert list(arr) == len(s) * [-1] and arr.heads == buckets.heads.tolist()
@@ -0,0 +1,135 @@
+import argparse
+import io
+import subprocess
+import sys
+from random import choice, randint
+
+import pytest
+
+from scicomp.exam.kk import bwt_encode_file
+from scicomp.exam.kk.cli import _size, main
+from utils import random_strings
+
+
+def _stdin(monkeypatch, data: bytes):
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(data)))
+
+
+def _occurrences(needle: bytes, data: bytes) -> list[int]:
+    return [i for i in range(len(data)) if data.startswith(needle, i)]
+
+
+@pytest.mark.parametrize(('fmt', 'workers'), (('lzw', 1), ('bwt', 1), ('bwt', 2)))
+@pytest.mark.parametrize('seq', random_strings(0, 5000, 5))
+def test_cli_files(seq, fmt, workers, tmp_path):
+    src, dst, res = (tmp_path / name for name in ('src', 'dst', 'res'))
+    src.write_bytes(seq.encode())
+    assert main(['compress', '-q', '-f', fmt, '-b', '1k', '-j', str(workers), str(src), '-o', str(dst)]) == 0
+    assert main(['decompress', '-q', '-j', str(workers), str(dst), '-o', str(res)]) == 0
+    assert res.read_bytes() == seq.encode()
+
+
+@pytest.mark.parametrize('args', (['-f', 'lzw', '--max-codes', '512', '--policy', 'lru'],
+                                  ['-f', 'bwt', '--method', 'doubling']))
+@pytest.mark.parametrize('seq', random_strings(0, 5000, 5))
+def test_cli_streams(seq, args, monkeypatch, capsysbinary):
+    _stdin(monkeypatch, seq.encode())
+    assert main(['compress', '-b', '1000', '-j', '1', *args]) == 0
+    compressed, err = capsysbinary.readouterr()
+    assert err.startswith(b'kk compress: ')
+
+    _stdin(monkeypatch, compressed)
+    assert main(['decompress', '-q', '-j', '1']) == 0
+    assert capsysbinary.readouterr() == (seq.encode(), b'')
+
+
+@pytest.mark.parametrize('fmt', ('lzw', 'bwt'))
+def test_cli_ratio(fmt, tmp_path, capsys):
+    data = b''.join(s.encode() for s in random_strings(50, N=100)) * 50
+    (tmp_path / 'src').write_bytes(data)
+    assert main(['compress', '-q', '-f', fmt, '-j', '1', str(tmp_path / 'src'), '-o', str(tmp_path / 'dst')]) == 0
+    assert (tmp_path / 'dst').stat().st_size < len(data) / 2
+    assert main(['decompress', '-q', '-j', '1', str(tmp_path / 'dst'), '-o', str(tmp_path / 'res')]) == 0
+    assert (tmp_path / 'res').read_bytes() == data
+    assert capsys.readouterr().err == ''
+
+    # LZW cannot be split, which is said
+    assert main(['compress', '-q', '-j', '2', str(tmp_path / 'src'), '-o', str(tmp_path / 'dst')]) == 0
+    assert '-j' in capsys.readouterr().err
+
+
+def test_cli_bwt_container(tmp_path):
+    data = b''.join(s.encode() for s in random_strings(1000, N=10))
+    (tmp_path / 'src').write_bytes(data)
+    bwt_encode_file(tmp_path / 'src', tmp_path / 'dst', block_size=1000, workers=1)
+    assert main(['decompress', '-q', str(tmp_path / 'dst'), '-o', str(tmp_path / 'res')]) == 0
+    assert (tmp_path / 'res').read_bytes() == data
+
+
+def test_cli_pipe(tmp_path):
+    data = b''.join(s.encode() for s in random_strings(10_000, N=10))
+    (tmp_path / 'src').write_bytes(data)
+    cli = [sys.executable, '-m', 'scicomp.exam.kk.cli']
+    compressed = subprocess.run([*cli, 'compress', '-q', '-f', 'bwt', '-j', '2', str(tmp_path / 'src')],
+                                capture_output=True, check=True).stdout
+    assert subprocess.run([*cli, 'decompress', '-q'], input=compressed,
+                          capture_output=True, check=True).stdout == data
+
+
+@pytest.mark.parametrize('block_size', ('3', '1k'))
+@pytest.mark.parametrize('seq', random_strings(0, 5000, 10))
+def test_cli_search(seq, block_size, tmp_path, monkeypatch, capsys):
+    data = seq.replace(choice(seq or 'a'), 'a').encode()
+    needle = data[(i := randint(0, len(data))):i+randint(1, 3)] or b'aa'
+    expected = _occurrences(needle, data)
+    (tmp_path / 'src').write_bytes(data)
+
+    for input in (str(tmp_path / 'src'), '-'):
+        _stdin(monkeypatch, data)
+        args = ['search', '-q', '-j', '1', '-b', block_size, needle.decode()]
+        assert main([*args, input]) == int(not expected)
+        assert capsys.readouterr().out.split() == list(map(str, expected))
+
+        _stdin(monkeypatch, data)
+        assert main([*args, '--first', input]) == int(not expected)
+        assert capsys.readouterr().out.split() == list(map(str, expected[:1]))
+
+        _stdin(monkeypatch, data)
+        assert main([*args, '--count', '--no-overlap', input]) == int(not expected)
+        assert int(capsys.readouterr().out) == data.count(needle)
+
+
+def test_cli_index(tmp_path, monkeypatch, capsys):
+    data = b'abracadabra'
+    (tmp_path / 'src').write_bytes(data)
+    assert main(['index', '-q', str(tmp_path / 'src'), 'abra', 'a', 'z']) == 0
+    assert capsys.readouterr().out == 'abra\t2\na\t5\nz\t0\n'
+
+    _stdin(monkeypatch, b'abra\nca\n')
+    assert main(['index', '-q', '--locate', str(tmp_path / 'src')]) == 0
+    assert capsys.readouterr().out == 'abra\t0 7\nca\t4\n'
+
+    _stdin(monkeypatch, data)
+    assert main(['index', '-q', '-', 'a']) == 0
+    assert capsys.readouterr().out == 'a\t5\n'
+
+
+def test_cli_errors(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'src').write_bytes(b'not compressed')
+    assert main(['decompress', str(tmp_path / 'src')]) == 2
+    assert 'not a kk' in capsys.readouterr().err
+
+    _stdin(monkeypatch, b'KKLZW\x01')
+    assert main(['decompress']) == 2
+    assert 'truncated' in capsys.readouterr().err
+
+    assert main(['search', '', str(tmp_path / 'src')]) == 2
+    assert main(['index', '-']) == 2
+    assert main(['search', 'x', str(tmp_path / 'missing')]) == 2
+
+
+def test_size():
+    assert [_size(s) for s in ('42', '900k', '16Mi', '1G', '2KiB')] == [42, 900_000, 2**24, 10**9, 2048]
+    for s in ('', '0', 'k', '1x'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            _size(s)
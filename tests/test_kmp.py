@@ -1,8 +1,11 @@
-from random import randint, random
+from random import choices, randint, random, sample
 
+import numpy as np
 import pytest
 
-from scicomp.exam.kk import kmp_search
+from scicomp.exam.kk import (
+    AhoCorasick, KMPMatcher, kmp_search, kmp_search_file, kmp_search_many, multi_search)
+from scicomp.exam.kk.kmp import _kmp_strong_table, _kmp_table
 from utils import _get_random_string, random_strings
 
 
@@ -21,3 +24,205 @@ def test_kmp_empty():
     assert kmp_search('', 'whatever') == 0
     assert kmp_search('', '') == 0
     assert kmp_search('whatever', '') is None
+
+
+def _periodic(period: str, n: int) -> str:
+    return (n // len(period) + 1) * period
+
+
+# adversarial needles and haystacks: long runs and periods with a twist
+_PERIODIC = [
+    *((n*'a' + 'b', m*'a') for n in (1, 5, 31) for m in (0, 30, 500)),
+    *((n*'a' + 'b', _periodic(n*'a' + 'b', 300)) for n in (1, 5, 31)),
+    *((n*'a' + 'b', _periodic((n-1)*'a' + 'b', 300)) for n in (2, 5, 31)),
+    *((_periodic('ab', n) + 'b', _periodic('ab', 400)) for n in (1, 6, 40)),
+    *((_periodic('aab', n)[:n], _periodic('aab', 400) + 'c') for n in (2, 7, 60)),
+    *((_periodic(''.join(choices('ab', k=randint(1, 5))), randint(1, 40)),
+       _periodic(''.join(choices('ab', k=randint(1, 5))), randint(0, 600))) for _ in range(50)),
+]
+
+
+class _Counted:
+    """An element that counts how many times it is compared."""
+    comparisons = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        _Counted.comparisons += 1
+        return self.value == other.value
+
+    def __ne__(self, other):
+        _Counted.comparisons += 1
+        return self.value != other.value
+
+
+@pytest.mark.parametrize('needle', [needle for needle, _ in _PERIODIC] + list(random_strings(0, 50, N=50)))
+def test_kmp_table(needle: str):
+    assert _kmp_table(needle) == [
+        max(k for k in range(i + 1) if needle[:k] == needle[i+1-k:i+1]) for i in range(len(needle))]
+
+    m, strong = len(needle), _kmp_strong_table(needle)
+    assert len(strong) == m + 1 and strong[0] == -1
+    assert not m or strong[m] == _kmp_table(needle)[-1]
+    for j in range(1, m):
+        assert strong[j] == max((k for k in range(j) if needle[:k] == needle[j-k:j]
+                                 and needle[k] != needle[j]), default=-1)
+
+
+@pytest.mark.parametrize(('needle', 'haystack'), _PERIODIC)
+def test_kmp_periodic(needle: str, haystack: str):
+    truth = haystack.find(needle)
+    assert kmp_search(needle, haystack) == kmp_search(needle, list(haystack)) == (None if truth == -1 else truth)
+    assert list(KMPMatcher(needle).finditer(iter(haystack))) == _occurrences(needle, haystack)
+    assert list(KMPMatcher(needle).finditer(haystack)) == _occurrences(needle, haystack)
+
+
+@pytest.mark.parametrize(('needle', 'haystack'), _PERIODIC)
+def test_kmp_comparisons(needle: str, haystack: str):
+    needle, haystack = list(map(_Counted, needle)), list(map(_Counted, haystack))
+    for table in (_kmp_table, _kmp_strong_table):
+        _Counted.comparisons = 0
+        table(needle)
+        assert _Counted.comparisons <= 3 * len(needle)
+
+    matcher = KMPMatcher(needle)
+    matcher.strong_table
+    _Counted.comparisons = 0
+    sum(1 for _ in matcher.finditer(haystack))
+    assert _Counted.comparisons <= 2 * len(haystack)
+
+
+def _occurrences(needle, haystack, overlapping=True):
+    ret, i = [], haystack.find(needle)
+    while i >= 0:
+        ret.append(i)
+        i = haystack.find(needle, i + (1 if overlapping or not needle else len(needle)))
+    return ret
+
+
+@pytest.mark.parametrize(
+    ('haystack', 'needle'), (
+        (''.join(choices('ab', k=randint(0, 200))), ''.join(choices('ab', k=randint(0, 6))))
+        for _ in range(300)
+    )
+)
+def test_kmp_matcher(haystack: str, needle: str):
+    matcher = KMPMatcher(needle)
+    assert matcher.find(haystack) == (None if (truth := haystack.find(needle)) == -1 else truth)
+    assert matcher.count(haystack, overlapping=False) == haystack.count(needle)
+    for overlapping in (True, False):
+        truth = _occurrences(needle, haystack, overlapping)
+        assert list(matcher.finditer(iter(haystack), overlapping)) == truth
+        assert matcher.count(haystack, overlapping) == len(truth)
+
+        cuts = sorted(sample(range(len(haystack) + 1), min(5, len(haystack) + 1)) + [0, len(haystack)])
+        matcher.reset()
+        assert [i for a, b in zip(cuts, cuts[1:])
+                for i in matcher.feed(haystack[a:b], overlapping)] == truth
+
+
+def test_kmp_matcher_feed():
+    matcher = KMPMatcher([1, 2, 1])
+    assert matcher.feed([0, 1]) == []
+    assert matcher.feed([2]) == []
+    assert matcher.feed([1, 2, 1]) == [1, 3]
+    assert list(matcher.finditer([1, 2, 1])) == [0]  # independent of feeding
+    assert matcher.feed([]) == [] and matcher.pos == 6
+    matcher.reset()
+    assert matcher.feed([2, 1]) == []
+
+    matcher = KMPMatcher('')
+    assert matcher.feed('') == [0]
+    assert matcher.feed('') == []
+    assert matcher.feed('ab') == [1, 2]
+
+
+@pytest.mark.parametrize(
+    ('haystack', 'needle'), (
+        (''.join(choices(alphabet, k=randint(256, 2000))), ''.join(choices(alphabet, k=randint(0, 6))))
+        for alphabet in ('ab', 'abc\xe9', 'ab\u20ac')
+        for _ in range(30)
+    )
+)
+@pytest.mark.parametrize('kind', ('str', 'bytes', 'memoryview', 'array'))
+def test_kmp_matcher_arrays(haystack: str, needle: str, kind: str):
+    if kind != 'str':
+        haystack, needle = haystack.encode(), needle.encode()
+    truth = _occurrences(needle, haystack)
+    if kind == 'memoryview':
+        haystack = memoryview(bytearray(haystack))
+    elif kind == 'array':
+        haystack, needle = np.frombuffer(haystack, dtype=np.uint8).astype(np.int16), list(needle)
+
+    matcher = KMPMatcher(needle)
+    assert list(matcher.finditer(haystack)) == truth
+    assert list(matcher.finditer(haystack, overlapping=False)) == list(
+        matcher.finditer(list(haystack), overlapping=False))
+    assert kmp_search(needle, haystack) == (truth[0] if truth else None)
+
+
+def test_kmp_matcher_periodic():
+    haystack = (50*'a' + 'b') * 2000
+    needle = 50*'a' + 'b' + 49*'a'
+    truth = _occurrences(needle, haystack)
+    assert list(KMPMatcher(needle).finditer(haystack)) == truth
+    assert KMPMatcher(needle + 'c').find(haystack) is None
+    assert KMPMatcher(needle.encode()).count(haystack.encode(), overlapping=False) == haystack.count(needle)
+    assert kmp_search([300], bytes(range(256)) * 2) is None
+    assert kmp_search([-1, 0], np.zeros(300, dtype=np.uint8)) is None
+
+
+@pytest.mark.parametrize('workers', (1, 2))
+def test_kmp_search_file(tmp_path, workers):
+    path = tmp_path / 'haystack'
+    for _ in range(20):
+        haystack = ''.join(choices('ab', k=randint(0, 300))).encode()
+        needle = ''.join(choices('ab', k=randint(1, 8))).encode()
+        path.write_bytes(haystack)
+        chunk_size = randint(1, 50)
+        assert kmp_search_file(path, needle, workers, chunk_size=chunk_size) == (
+            None if (truth := haystack.find(needle)) == -1 else truth)
+        for overlapping in (True, False):
+            assert list(kmp_search_file(path, needle, workers, find_all=True, overlapping=overlapping,
+                                        chunk_size=chunk_size)) == _occurrences(needle, haystack, overlapping)
+    assert kmp_search_file(path, b'', workers) == 0
+    assert list(kmp_search_file(path, b'', workers, find_all=True)) == list(range(len(haystack) + 1))
+
+
+@pytest.mark.parametrize(('workers', 'pool'), ((1, 'process'), (2, 'process'), (2, 'thread')))
+def test_kmp_search_many(workers, pool):
+    needle = 'abab'
+    haystacks = [''.join(choices('ab', k=randint(0, 300))) for _ in range(200)]
+    haystacks += [haystacks[-1].encode(), bytearray(haystacks[-2].encode()), memoryview(b'xxabab')]
+    haystacks += [np.frombuffer(b'b' * (2 << 20) + b'abab', dtype=np.uint8), b'b' * (1 << 20) + b'abab']
+    firsts = [None if (i := h.find(needle) if isinstance(h, str) else bytes(h).find(needle.encode())) < 0
+              else i for h in haystacks]
+    assert list(kmp_search_many(needle, haystacks[:200], workers=workers, pool=pool, chunksize=7)) == firsts[:200]
+    assert list(kmp_search_many(needle.encode(), haystacks[200:], workers=workers, pool=pool)) == firsts[200:]
+    for overlapping in (True, False):
+        assert sorted(kmp_search_many(needle, haystacks[:200], find_all=True, overlapping=overlapping,
+                                      workers=workers, pool=pool, ordered=False)) == [
+            (i, _occurrences(needle, h, overlapping)) for i, h in enumerate(haystacks[:200])]
+    with pytest.raises(ValueError):
+        next(kmp_search_many(needle, haystacks, workers=workers, pool='fibers'))
+
+
+@pytest.mark.parametrize('seq', random_strings(0, 1000, N=100))
+def test_multi_search(seq):
+    needles = [seq[i:i+randint(0, 10)] for i in range(0, len(seq), 10)]
+    needles += [_get_random_string(randint(1, 3)) for _ in range(10)]
+    needles += [''.join(choices('ab', k=randint(1, 8))) for _ in range(10)]
+    seq += ''.join(choices('ab', k=100))
+    assert sorted(multi_search(needles, iter(seq))) == sorted(
+        (needle, i) for needle in needles for i in range(len(seq) + 1) if seq.startswith(needle, i))
+
+
+def test_aho_corasick():
+    assert list(AhoCorasick(['he', 'she', 'his', 'hers']).finditer('ushers')) == [
+        ('she', 1), ('he', 2), ('hers', 2)]
+    assert list(AhoCorasick([[1, 2], [2]]).finditer([1, 2, 1, 2])) == [
+        ([1, 2], 0), ([2], 1), ([1, 2], 2), ([2], 3)]
+    assert list(AhoCorasick(['']).finditer('ab')) == [('', 0), ('', 1), ('', 2)]
+    assert list(AhoCorasick([]).finditer('ab')) == []
@@ -1,9 +1,128 @@
+import string
+from random import randint
+
+import numpy as np
 import pytest
+from more_itertools import chunked
 
-from scicomp.exam.kk.lzw import lzw_decode, lzw_encode
+from scicomp.exam.kk.lzw import (LZWDecoder, LZWEncoder, coders, lzw_compress_file,
+                                 lzw_decode, lzw_decompress_file, lzw_encode, lzw_encode_many)
+from scicomp.exam.kk.lzw.container import pack_codes, unpack_codes
 from utils import _alphabet, random_strings
 
 
 @pytest.mark.parametrize('seq', random_strings(10, 1000, 100))
 def test_lzw(seq):
     assert all(a == b for a, b in zip(lzw_decode(lzw_encode(seq, _alphabet), _alphabet), seq))
+
+
+def test_lzw_encode():
+    assert list(lzw_encode('supercalifragilisticexpialidocious', string.ascii_lowercase)) == [
+        18, 20, 15, 4, 17, 2, 0, 11, 8, 5, 17, 0, 6, 8, 33, 18, 19, 8, 2, 4,
+        23, 15, 8, 32, 8, 3, 14, 2, 8, 14, 20, 18]
+    assert list(lzw_encode('', string.ascii_lowercase)) == []
+
+
+@pytest.mark.parametrize('seq', random_strings(10, 1000, 100))
+def test_lzw_chunked(seq):
+    encoder, decoder = LZWEncoder(_alphabet), LZWDecoder(_alphabet)
+    codes = [c for chunk in chunked(seq, randint(1, 50)) for c in encoder.update(chunk)] + encoder.flush()
+    assert codes == list(lzw_encode(seq, _alphabet))
+    assert ''.join(
+        c for chunk in chunked(codes, randint(1, 50)) for c in decoder.update(chunk)
+    ) + ''.join(decoder.flush()) == seq
+
+
+@pytest.mark.parametrize('policy', ('freeze', 'reset', 'lru'))
+@pytest.mark.parametrize('max_codes', (len(_alphabet) + 2, 2**8, 2**10))
+@pytest.mark.parametrize('seq', random_strings(1000, 5000, 10))
+def test_lzw_bounded(seq, max_codes, policy):
+    seq = seq[:randint(1, 100)] * 10 + seq
+    codes = list(lzw_encode(seq, _alphabet, max_codes, policy))
+    assert max(codes) < max_codes
+    assert ''.join(lzw_decode(codes, _alphabet, max_codes, policy)) == seq
+
+
+def test_lzw_bounded_invalid():
+    with pytest.raises(ValueError):
+        LZWEncoder(_alphabet, 2**8, 'random')
+    with pytest.raises(ValueError):
+        LZWDecoder(_alphabet, len(_alphabet), 'reset')
+
+
+@pytest.mark.parametrize('policy', ('freeze', 'reset', 'lru'))
+@pytest.mark.parametrize('max_codes', (None, 2**8, 2**12))
+@pytest.mark.parametrize('seq', random_strings(0, 5000, 5))
+def test_lzw_file(seq, max_codes, policy, tmp_path):
+    src, dst, res = (tmp_path / name for name in ('src', 'dst', 'res'))
+    src.write_bytes(data := (seq[:randint(0, 100)] * 10 + seq).encode())
+    assert lzw_compress_file(src, dst, _alphabet.encode(), max_codes, policy, randint(1, 1000)) == dst.stat().st_size
+    assert lzw_decompress_file(dst, res) == len(data)
+    assert res.read_bytes() == data
+
+
+def test_pack_codes():
+    widths = np.random.randint(1, 42, size=1000)
+    codes = np.random.randint(0, 2**widths)
+    assert np.array_equal(unpack_codes(pack_codes(codes, widths), widths), codes)
+    with pytest.raises(ValueError):
+        pack_codes(codes, widths - 1)
+
+
+@pytest.mark.parametrize('policy', ('freeze', 'reset', 'lru'))
+@pytest.mark.parametrize('max_codes', (None, 2**8, 2**12))
+@pytest.mark.parametrize(('nalph', 'dtype'), ((2, np.uint8), (42, np.uint8), (256, np.uint8), (1000, np.uint16)))
+def test_lzw_array(nalph, dtype, max_codes, policy):
+    if max_codes is not None and max_codes <= nalph + 1:
+        pytest.skip()
+    seq = np.random.randint(0, nalph, size=randint(0, 5000)).astype(dtype)
+    seq = np.concatenate((np.tile(seq[:randint(1, 20)], 100), seq))
+    codes = lzw_encode(seq, range(nalph), max_codes, policy)
+    assert isinstance(codes, np.ndarray)
+    assert codes.tolist() == list(lzw_encode(seq.tolist(), range(nalph), max_codes, policy))
+    assert np.array_equal(np.fromiter(lzw_decode(codes, range(nalph), max_codes, policy), int), seq)
+
+
+@pytest.mark.parametrize('policy', ('freeze', 'reset'))
+@pytest.mark.parametrize('max_codes', (None, 2**8, 2**12))
+def test_lzw_dense_table(max_codes, policy, monkeypatch):
+    seq = np.random.randint(0, 4, size=20_000).astype(np.uint8)
+    monkeypatch.setattr(coders, '_DENSE_ALPHABET', 0)
+    expected = lzw_encode(seq, range(4), max_codes, policy)
+    # a dense table that has to grow a few times, and then switch to a hash
+    # table (mid-chunk)
+    monkeypatch.setattr(coders, '_DENSE_ALPHABET', 4)
+    monkeypatch.setattr(coders, '_DENSE_ROWS', 16)
+    monkeypatch.setattr(coders, '_DENSE_ENTRIES', 4 * 1000)
+    assert np.array_equal(lzw_encode(seq, range(4), max_codes, policy), expected)
+
+
+def test_lzw_bytes():
+    data = string.ascii_letters.encode() * 42
+    assert lzw_decode(lzw_encode(data, _alphabet.encode()), _alphabet.encode()) == data
+    with pytest.raises(KeyError):
+        lzw_encode(b'#', _alphabet.encode())
+    with pytest.raises(ValueError):
+        LZWDecoder(_alphabet).decode_array([len(_alphabet) + 1])
+
+
+@pytest.mark.parametrize(('workers', 'pool'), ((1, 'process'), (2, 'process'), (2, 'thread')))
+def test_lzw_encode_many(workers, pool):
+    seqs = list(random_strings(0, 500, 100))
+    alphabet = set(_alphabet)  # in the order of this process
+    expected = [list(lzw_encode(seq, list(alphabet))) for seq in seqs]
+    assert list(lzw_encode_many(seqs, alphabet, workers=workers, pool=pool, chunksize=9)) == expected
+    assert sorted(lzw_encode_many(seqs, alphabet, 100, 'reset', workers=workers, pool=pool, ordered=False)) == [
+        (i, list(lzw_encode(seq, list(alphabet), 100, 'reset'))) for i, seq in enumerate(seqs)]
+
+    data = [np.arange(1 << 20).astype(np.uint8), np.random.randint(0, 256, 100).astype(np.uint8)]
+    data += [data[0].tobytes(), bytearray(data[1].tobytes())]
+    for ret, seq in zip(lzw_encode_many(data, bytes(range(256)), workers=workers, pool=pool), data):
+        assert np.array_equal(ret, lzw_encode(seq, bytes(range(256))))
+
+
+def test_lzw_decode_types():
+    assert lzw_decode(lzw_encode('abracadabra', _alphabet), _alphabet) == 'abracadabra'
+    assert lzw_decode(lzw_encode(b'abracadabra', b'abcdr'), b'abcdr') == b'abracadabra'
+    assert lzw_decode(lzw_encode(list(b'abracadabra'), b'abcdr'), b'abcdr') == b'abracadabra'
+    assert list(lzw_decode(lzw_encode([0, 1, 0, 1, 0], range(2)), range(2))) == [0, 1, 0, 1, 0]
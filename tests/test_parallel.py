@@ -0,0 +1,38 @@
+from array import array
+from itertools import count
+from time import sleep
+
+import numpy as np
+import pytest
+
+from scicomp.exam.kk import kmp_search_many
+from scicomp.exam.kk._parallel import _imap
+
+
+@pytest.mark.parametrize('n', (1000, 1 << 19))  # pickled, and through shared memory
+def test_imap_memoryview(n):
+    haystacks = [memoryview(array('i', [5, -1, 2**20] * n + [7, 300])),
+                 memoryview(array('d', [0.5] * n + [1.5, 2.5])),
+                 memoryview(np.arange(n, dtype=np.int64))]
+    needles = ([7, 300], [1.5, 2.5], [n - 2, n - 1])
+    for haystack, needle in zip(haystacks, needles):
+        expected = list(kmp_search_many(needle, [haystack], find_all=True, workers=1))
+        assert expected == [[len(haystack) - 2]]
+        assert list(kmp_search_many(needle, [haystack], find_all=True, workers=2)) == expected
+
+
+def _slow_first(i):
+    if not i:
+        sleep(0.5)
+    return i
+
+
+def test_imap_backlog():
+    consumed = count()
+    inputs = (next(consumed) for _ in range(10**6))
+    results = _imap(_slow_first, inputs, workers=2, pool='thread', chunksize=1)
+    assert next(results) == 0
+    # while the first input is held up, only about 2 * workers * chunksize
+    # results are kept waiting (plus the tasks in flight)
+    assert next(consumed) < 20
+    results.close()
@@ -0,0 +1,94 @@
+import random
+from threading import Barrier, Thread
+
+import numpy as np
+
+from scicomp.exam import kk
+from scicomp.exam.kk import KMPMatcher, kmp_search, lzw_decode, lzw_encode
+from scicomp.exam.kk.bwt.suffix_array import get_SL, suffix_array
+from scicomp.exam.kk.profiling import current, profile, Stats
+
+
+def test_profile():
+    assert current() is None
+    with kk.profile() as stats:
+        assert current() is stats
+        with profile() as inner:
+            assert current() is inner
+        assert current() is stats
+    assert current() is None
+    assert not inner.times and not stats.times
+
+
+def test_profile_threads():
+    barrier, seen = Barrier(2), {}
+
+    def work(name):
+        with profile() as stats:
+            barrier.wait()  # both blocks are open at the same time
+            with kk.profiling.phase(name):
+                pass
+            barrier.wait()
+            seen[name] = stats, current()
+        assert current() is None
+
+    with profile() as outer:
+        threads = [Thread(target=work, args=(name,)) for name in 'ab']
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert current() is outer
+    assert not outer.times
+    for name, (stats, cur) in seen.items():
+        assert cur is stats and set(stats.times) == {name}
+
+
+def test_stats():
+    stats = Stats()
+    with stats.phase('outer'):
+        with stats.phase('inner'):
+            pass
+        with stats.phase('inner'):
+            pass
+    stats.count('a'), stats.count('a', 2), stats.peak('b', 5), stats.peak('b', 3)
+    assert stats.calls == {'outer': 1, 'inner': 2}
+    assert stats.counters == {'a': 3, 'b': 5}
+    assert all(t >= 0 for t in stats.times.values())
+    assert 'outer' in stats.report() and 'b' in str(stats)
+
+
+def test_profile_suffix_array():
+    s = bytes(random.choices(b'ab', k=2000))
+    with profile() as stats:
+        assert np.array_equal(suffix_array(s), suffix_array(s, method='doubling'))
+    t = get_SL(np.frombuffer(s + b'\0', dtype=np.uint8))
+    assert stats.counters['suffix_array.lms'] >= np.count_nonzero(t[1:] & ~t[:-1])
+    assert stats.counters['suffix_array.levels'] >= 2
+    assert stats.counters['suffix_array.doubling_rounds'] >= 1
+    assert {'suffix_array.get_SL', 'suffix_array.induce', 'suffix_array.naming',
+            'suffix_array.sais', 'suffix_array.doubling'} <= set(stats.times)
+
+
+def test_profile_kmp():
+    with profile() as stats:
+        matcher = KMPMatcher('abab')
+        assert matcher.find(list('xxabab')) == 2
+        assert matcher.count('xxabab' * 100) == 100
+        assert kmp_search(b'a' * 50 + b'b' + b'a' * 50, (b'a' * 50 + b'b') * 2000) == 0
+    assert stats.calls['kmp.scan'] == 3
+    assert stats.calls['kmp.table'] >= 2
+    assert stats.counters['kmp.windows'] >= 1 and stats.counters['kmp.automaton_windows'] == 1
+
+
+def test_profile_lzw():
+    seq = bytes(random.choices(b'abc', k=10000))
+    with profile() as stats:
+        codes = lzw_encode(seq, bytes(range(256)))
+        assert lzw_decode(codes, bytes(range(256))) == seq
+        assert lzw_decode(codes.tolist(), bytes(range(256))) == seq
+    assert stats.counters['lzw.encode.symbols'] == len(seq)
+    assert stats.counters['lzw.encode.lookups'] == len(seq) - 1
+    assert stats.counters['lzw.encode.codes'] == len(codes)
+    assert stats.counters['lzw.decode.symbols'] == 2 * len(seq)
+    assert stats.counters['lzw.bag'] == 256 + len(codes) - 1
@@ -0,0 +1,87 @@
+import tracemalloc
+from random import choice, randint
+
+import numpy as np
+import pytest
+
+from scicomp.exam.kk.stages import (huffman_decode, huffman_encode, mtf_decode,
+                                    mtf_encode, pipeline, rle_decode, rle_encode, STAGES)
+from scicomp.exam.kk.stages.huffman import MAX_BITS, _header, code_lengths
+from utils import random_strings
+
+
+def _random_runs(n):
+    return np.repeat(np.random.randint(0, randint(1, 300), size=n), np.random.geometric(0.3, size=n))
+
+
+@pytest.mark.parametrize('seq', (_random_runs(randint(0, 1000)) for _ in range(100)))
+def test_mtf(seq):
+    front, expected = list(range(300)), []
+    for c in seq.tolist():
+        expected.append(i := front.index(c))
+        front.insert(0, front.pop(i))
+    assert mtf_encode(seq).tolist() == expected
+    assert np.array_equal(mtf_decode(mtf_encode(seq)), seq)
+
+
+@pytest.mark.parametrize('seq', (_random_runs(randint(0, 1000)) % randint(1, 5) for _ in range(100)))
+def test_rle(seq):
+    encoded = rle_encode(seq)
+    assert np.array_equal(encoded[encoded > 1] - 1, seq[seq > 0])
+    assert np.array_equal(rle_decode(encoded), seq)
+
+
+@pytest.mark.parametrize('seq', (np.random.zipf(1.5, randint(0, 5000)) % randint(1, 1000) for _ in range(100)))
+def test_huffman(seq):
+    assert np.array_equal(huffman_decode(huffman_encode(seq)), seq)
+
+
+def test_huffman_large_alphabet():
+    # sparse and dense code spaces of tens of thousands of elements, as after LZW
+    for seq in (np.arange(0, 60000, 60), np.arange(30000)):
+        encoded = huffman_encode(seq)
+        assert np.array_equal(huffman_decode(encoded), seq)
+        # the code lengths take (much) less than a byte per element of the alphabet
+        assert _header.unpack_from(encoded)[2] < seq.max() / 6
+
+
+def test_huffman_memory():
+    # long codes (of up to MAX_BITS) over a long stream
+    seq = np.random.zipf(1.3, size=300_000) % 4000
+    encoded = huffman_encode(seq)
+    nbits = 8 * (len(encoded) - _header.size - _header.unpack_from(encoded)[2])
+    tracemalloc.start()
+    try:
+        decoded = huffman_decode(encoded)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert np.array_equal(decoded, seq)
+    # a few bytes per bit, whatever the code lengths, and the lookup tables
+    assert peak < 16 * nbits + 4 * 2**MAX_BITS
+
+
+def test_lzw_stage_large_alphabet():
+    block = np.array([70000, 1, 70000, 1, 70000, 1, 65536, 0])
+    stage = STAGES['lzw']
+    assert np.array_equal(stage.decode(stage.encode(block)), block)
+
+
+def test_code_lengths():
+    assert code_lengths([1, 1, 2, 4, 0, 8]).tolist() == [4, 4, 3, 2, 0, 1]
+    assert code_lengths([0, 5]).tolist() == [0, 1]
+    # Fibonacci frequencies make the deepest trees
+    fib = [1, 1]
+    while len(fib) < 40:
+        fib.append(fib[-1] + fib[-2])
+    lengths = code_lengths(fib, max_bits=20)
+    assert lengths.max() == 20 and (2.**-lengths).sum() <= 1
+
+
+@pytest.mark.parametrize('seq', random_strings(0, 5000, N=20))
+def test_pipeline(seq):
+    data = (seq[:len(seq) // 3] * 3 + seq).encode()
+    stages = choice((['bwt', 'mtf', 'rle', 'huffman'], ['lzw', 'huffman'], ['bwt', 'mtf', 'rle', 'lzw'], []))
+    p = pipeline(stages, block_size=randint(1, 3000))
+    assert b''.join(p.decode(list(p.encode(data)))) == data
+    assert set(p.times) == set(stages)